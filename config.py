@@ -27,6 +27,9 @@ MODEL_CONFIG = {
     "temperature": 0.7,
     "max_tokens": 4096,
     "top_p": 0.9,
+
+    # 启动时发送一个极短的请求预热连接（会产生一次计费调用，默认关闭）
+    "warmup": False,
 }
 
 
@@ -2,38 +2,156 @@
 Agent引擎 - 自主任务执行协调器
 负责理解用户意图、调用工具、处理结果和决策下一步行动
 """
-from typing import Dict, List, Any, Optional, Iterator
-from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Iterator, AsyncIterator, Tuple, Sequence, Callable
+from dataclasses import dataclass, field, asdict
 from datetime import datetime
+from collections import abc, deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, Future
+from logging.handlers import QueueHandler, QueueListener
+import asyncio
+import atexit
 import json
+import logging
+import queue
+import re
+import sys
+import threading
 import time
 import traceback
 
-from core.llm_engine import LLMEngine, Message, MessageRole, LLMResponse
+from core.llm_engine import LLMEngine, Message, MessageRole, LLMResponse, ResponseCache
 from core.tool_definitions import (
     ToolDefinition, 
     get_all_tool_definitions, 
     ToolCallingFormatter
 )
 from core.tool_executor import ToolExecutor, ToolResult
+from core.records import SessionStep
 from config import DEFAULT_SYSTEM_PROMPT
 
+try:
+    import orjson
+    _json_loads = orjson.loads  # orjson.JSONDecodeError 是 json.JSONDecodeError 的子类
+except ImportError:
+    _json_loads = json.loads
 
-@dataclass
-class AgentStep:
-    """Agent执行步骤记录"""
-    step_number: int
-    timestamp: str
-    user_input: str
-    llm_response: str
-    tool_calls: List[Dict[str, Any]]
-    tool_results: List[ToolResult]
-    is_completed: bool
-    final_message: Optional[str] = None
-    thinking: Optional[str] = None
+logger = logging.getLogger(__name__)
+_log_listener: Optional[QueueListener] = None
 
 
-@dataclass
+class _ConsoleHandler(logging.StreamHandler):
+    """控制台输出处理器，消息自带换行；收到带flush_event的记录时通知调用方已写出"""
+    terminator = ""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "flush_event", None)
+        if event is not None:
+            self.flush()
+            event.set()
+            return True
+        return super().handle(record)
+
+
+def _ensure_console_logging():
+    """
+    为Agent输出配置控制台日志（只配置一次）
+
+    日志记录先进入队列，由后台线程写到stdout，执行循环中的输出调用不会阻塞在终端写入上。
+    消息自带换行，以便流式输出的思考内容可以逐段拼接。
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+
+    handler = _ConsoleHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    _log_listener = QueueListener(log_queue, handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+
+def _flush_console_logging(timeout: float = 5.0):
+    """等待队列中已有的输出写到终端，避免与调用方随后的print交错"""
+    if _log_listener is None:
+        return
+    event = threading.Event()
+    logger.info("", extra={"flush_event": event})
+    event.wait(timeout)
+
+
+def write_console(text: str):
+    """
+    向控制台输出一段文本（如流式生成的回复）
+
+    已配置控制台日志时经同一个队列输出，与思考过程、执行日志保持先后顺序，不会在一行中间交错。
+    """
+    if _log_listener is not None:
+        logger.info("%s", text)
+    else:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+# 无副作用的工具，可以与相邻的同类调用并发执行
+PARALLEL_SAFE_TOOLS = frozenset({"read", "glob", "grep", "webfetch", "skill", "session_detail"})
+
+# 从文本中提取工具调用的模式
+_TOOL_CALL_PATTERNS = tuple(
+    re.compile(pattern, re.DOTALL)
+    for pattern in (
+        r'调用工具["：:]\s*(\w+)\s*参数?\s*[:：]?\s*(\{[^}]+\})',
+        r'使用工具["：:]\s*(\w+)\s*\(([^)]+)\)',
+        r'"name":\s*"(\w+)"[^}]*"arguments":\s*(\{[^}]+\})',
+    )
+)
+
+# 最终回答特征
+_FINAL_INDICATORS = (
+    "任务完成", "已经完成", "已完成",
+    "已经为您创建", "已经为您生成",
+    "文件已创建", "代码已生成", "已成功创建",
+    "代码已保存"
+)
+_FINAL_INDICATOR_PATTERN = re.compile("|".join(map(re.escape, _FINAL_INDICATORS)))
+_QUESTION_KEYWORDS = ("解释", "说明", "什么是", "如何", "为什么")
+_OPERATION_KEYWORDS = ("创建", "生成", "写", "修改", "编辑", "删除", "查看", "请求")
+
+
+class SequenceView(abc.Sequence):
+    """列表的只读视图，不复制数据，内容随底层列表变化"""
+    __slots__ = ("_items",)
+
+    def __init__(self, items):
+        self._items = items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            # deque 不支持切片
+            return list(self._items)[index]
+        return self._items[index]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self._items)!r})"
+
+
+# Agent执行步骤与会话步骤是同一个记录类型，产生后可直接存入会话
+AgentStep = SessionStep
+
+
+@dataclass(slots=True)
 class AgentConfig:
     """Agent配置"""
     max_iterations: int = 200
@@ -41,6 +159,17 @@ class AgentConfig:
     execution_delay: float = 0.5
     verbose_output: bool = True
     auto_continue: bool = True
+    max_parallel_tools: int = 4
+    stream_response: bool = True
+    # 并发执行的工具等待超时（秒）；超时只让该调用返回失败，线程中的工具不会被取消，仍可能继续写文件
+    tool_timeout: float = 600.0
+    response_cache_dir: Optional[str] = None
+    response_cache_ttl: float = 86400.0
+    max_history_messages: int = 80
+    # 内存中保留的最近执行步骤数，统计信息按步骤累计，不依赖完整列表
+    max_kept_steps: int = 64
+    # 开启后未使用过的工具只发送名称和描述，首次被调用后才发送完整参数schema
+    lazy_tool_schemas: bool = False
 
 
 class AgentEngine:
@@ -68,18 +197,43 @@ class AgentEngine:
         self.config = config or AgentConfig()
         self._session_summary = session_summary
 
-        self._conversation_history: List[Message] = []
-        self._execution_steps: List[AgentStep] = []
+        self._conversation_history: deque = deque()
+        # 对话开头固定保留的消息数（系统提示词、会话上下文、用户输入），压缩历史时不动
+        self._pinned_messages = 0
+        self._execution_steps: deque = deque(maxlen=max(1, self.config.max_kept_steps))
+        self._reset_step_stats()
         self._current_step = 0
         self._is_running = False
         self._start_time: Optional[float] = None
+        # 工具结果特征在追加TOOL消息时记录，避免每步反向扫描整个对话历史
+        self._tool_success_seen = False
+        self._tool_saved_seen = False
+        # lazy_tool_schemas 模式下已发送完整schema的工具
+        self._promoted_tools: set = set()
+        self._lazy_tools: Optional[List[Dict[str, Any]]] = None
+        # 流式输出时逐段接收LLM回复正文的回调
+        self._on_token: Optional[Callable[[str], None]] = None
+
+        if self.config.verbose_output:
+            _ensure_console_logging()
 
         self._tool_definitions = get_all_tool_definitions()
+        self._tools_openai = ToolCallingFormatter.format_for_engine("openai", self._tool_definitions)
+        self._default_system_prompt = self._build_default_system_prompt()
+        self._response_cache = (
+            ResponseCache(self.config.response_cache_dir, self.config.response_cache_ttl)
+            if self.config.response_cache_dir else None
+        )
+        self._tool_pool = ThreadPoolExecutor(
+            max_workers=max(1, self.config.max_parallel_tools),
+            thread_name_prefix="agent-tool"
+        )
     
     def start(
         self,
         user_input: str,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Iterator[AgentStep]:
         """
         开始执行用户任务
@@ -87,21 +241,106 @@ class AgentEngine:
         Args:
             user_input: 用户自然语言输入
             system_prompt: 自定义系统提示词
+            on_token: 可选回调，流式请求时LLM回复正文每到达一段就调用一次
             
         Yields:
             AgentStep: 执行步骤记录
         """
+        self._begin(user_input, system_prompt, on_token)
+        step_number = 0
+        
+        while self._is_running and self._check_limits():
+            step_number += 1
+            self._announce_step(step_number)
+            
+            step = self._execute_step(step_number, user_input)
+            if step is None:
+                step_number -= 1
+                break
+            if self._log_enabled() or self._on_token is not None:
+                _flush_console_logging()
+            yield step
+            if self._should_stop(step):
+                break
+
+            if self.config.execution_delay > 0:
+                time.sleep(self.config.execution_delay)
+        
+        if not self._is_running:
+            yield self._interrupted_step(step_number + 1, user_input)
+
+    async def astart(
+        self,
+        user_input: str,
+        system_prompt: Optional[str] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> AsyncIterator[AgentStep]:
+        """
+        异步执行用户任务，多个Agent可以共享同一个事件循环
+
+        每个步骤（LLM请求 + 工具执行）在线程中运行，等待期间不阻塞事件循环。
+
+        Args:
+            user_input: 用户自然语言输入
+            system_prompt: 自定义系统提示词
+            semaphore: 可选的共享信号量，用于限制多个Agent同时执行的步骤数
+            on_token: 可选回调，在执行步骤的线程中逐段接收LLM回复正文
+
+        Yields:
+            AgentStep: 执行步骤记录
+        """
+        self._begin(user_input, system_prompt, on_token)
+        step_number = 0
+
+        while self._is_running and self._check_limits():
+            step_number += 1
+            self._announce_step(step_number)
+
+            if semaphore is not None:
+                async with semaphore:
+                    step = await asyncio.to_thread(self._execute_step, step_number, user_input)
+            else:
+                step = await asyncio.to_thread(self._execute_step, step_number, user_input)
+            if step is None:
+                step_number -= 1
+                break
+            if self._log_enabled() or self._on_token is not None:
+                await asyncio.to_thread(_flush_console_logging)
+            yield step
+            if self._should_stop(step):
+                break
+
+            if self.config.execution_delay > 0:
+                await asyncio.sleep(self.config.execution_delay)
+
+        if not self._is_running:
+            yield self._interrupted_step(step_number + 1, user_input)
+
+    def _begin(
+        self,
+        user_input: str,
+        system_prompt: Optional[str],
+        on_token: Optional[Callable[[str], None]] = None
+    ):
+        """重置执行状态并构建初始对话"""
+        self._on_token = on_token
         self._is_running = True
         self._start_time = time.time()
         self._execution_steps.clear()
+        self._reset_step_stats()
         self._current_step = 0
+        self._tool_success_seen = False
+        self._tool_saved_seen = False
+        self._promoted_tools.clear()
+        self._lazy_tools = None
         
         if system_prompt is None:
             system_prompt = self._get_default_system_prompt()
         
-        self._conversation_history = [
+        self._conversation_history = deque([
             Message(role=MessageRole.SYSTEM, content=system_prompt),
-        ]
+        ])
         
         if self._session_summary:
             self._conversation_history.append(
@@ -111,48 +350,45 @@ class AgentEngine:
         self._conversation_history.append(
             Message(role=MessageRole.USER, content=user_input),
         )
-        
-        step_number = 0
-        
-        while self._is_running and self._check_limits():
-            step_number += 1
-            self._current_step = step_number
-            
-            if self.config.verbose_output:
-                print(f"\n{'='*60}")
-                print(f"步骤 {step_number}")
-                # print(f"{'='*60}")
-            
-            step = self._execute_step(step_number, user_input)
-            yield step
-            if len(step.tool_results)>0 and step.tool_results[0].content == '已向用户发送问题':
-                break
+        self._pinned_messages = len(self._conversation_history)
 
-            if step.is_completed:
-                break
+    def _announce_step(self, step_number: int):
+        """记录当前步骤编号"""
+        self._current_step = step_number
+        if self._log_enabled():
+            logger.info("\n%s\n步骤 %d\n", "=" * 60, step_number)
 
+    def _log_enabled(self) -> bool:
+        """是否输出执行过程"""
+        return self.config.verbose_output and logger.isEnabledFor(logging.INFO)
 
-            if self.config.execution_delay > 0:
-                time.sleep(self.config.execution_delay)
-        
-        if not self._is_running:
-            yield AgentStep(
-                step_number=step_number + 1,
-                timestamp=datetime.now().isoformat(),
-                user_input=user_input,
-                llm_response="",
-                tool_calls=[],
-                tool_results=[],
-                is_completed=False,
-                final_message="任务被中断"
-            )
+    def _should_stop(self, step: AgentStep) -> bool:
+        """判断步骤执行后是否结束循环"""
+        if len(step.tool_results) > 0 and step.tool_results[0].content == '已向用户发送问题':
+            return True
+        return step.is_completed
+
+    def _interrupted_step(self, step_number: int, user_input: str) -> AgentStep:
+        """构造任务被中断时的步骤记录"""
+        return AgentStep(
+            step_number=step_number,
+            timestamp=datetime.now().isoformat(),
+            user_input=user_input,
+            llm_response="",
+            tool_calls=[],
+            tool_results=[],
+            is_completed=False,
+            final_message="任务被中断"
+        )
     
     def _execute_step(
         self,
         step_number: int,
         original_user_input: str
-    ) -> AgentStep:
-        """执行单个步骤"""
+    ) -> Optional[AgentStep]:
+        """执行单个步骤，请求LLM期间被停止时返回None"""
+        now = time.time()
+        timestamp = datetime.fromtimestamp(now).isoformat()
         tool_calls = []
         tool_results = []
         llm_response = ""
@@ -160,14 +396,11 @@ class AgentEngine:
 
         try:
 
-            # 获取工具定义并传递给LLM
-            tools = self.get_tool_definitions("openai")
+            self._compact_history()
 
-            response = self.llm_engine.chat(
-                self._conversation_history,
-                tools=tools,
-                temperature=0.1
-            )
+            tools = self._current_tools()
+
+            response, prefetched = self._request_llm(tools)
 
             if isinstance(response, LLMResponse):
                 llm_response = response.content
@@ -176,11 +409,13 @@ class AgentEngine:
             else:
                 raise ("格式出错了")
 
-            if self.config.verbose_output:
+            # 请求LLM期间任务被停止：不再执行这一轮的工具调用，由调用方生成中断记录
+            if not self._is_running:
+                return None
+
+            if self._log_enabled() and not self.config.stream_response:
                 if thinking_content:
-                    print("思考过程:")
-                    print(thinking_content)
-                    print('-'*60)
+                    logger.info("思考过程:\n%s\n%s\n", thinking_content, "-" * 60)
 
             
             if tool_calls:
@@ -189,42 +424,31 @@ class AgentEngine:
                 assistant_message = Message(
                     role=MessageRole.ASSISTANT,
                     content="",
-                    timestamp=time.time(),
+                    timestamp=now,
                     tool_calls=tool_calls
                 )
                 self._conversation_history.append(assistant_message)
                 
-                for call in tool_calls:
-                    # 提取工具名称（支持OpenAI格式）
-                    if isinstance(call, dict) and "function" in call:
-                        tool_name = call.get("function", {}).get("name", "")
-                        # 提取参数
-                        args_data = call.get("function", {}).get("arguments", {})
-                        if isinstance(args_data, str):
-                            try:
-                                arguments = json.loads(args_data)
-                            except json.JSONDecodeError:
-                                arguments = {"raw": args_data}
-                        else:
-                            arguments = args_data
-                    else:
-                        tool_name = call.get("name", "")
-                        arguments = call.get("arguments", {})
-                    
-                    result = self.tool_executor.execute_tool(tool_name, arguments)
-                    tool_results.append(result)
-                    
+                parsed_calls = [self._parse_call(call) for call in tool_calls]
+                if self.config.lazy_tool_schemas:
+                    self._promote_tools(name for name, _ in parsed_calls)
+                tool_results = self._run_tools(parsed_calls, prefetched)
+
+                for (tool_name, arguments), result in zip(parsed_calls, tool_results):
                     result_message = self._format_tool_result(result)
                     self._add_tool_message(result_message)
 
-                    if self.config.verbose_output:
-                        print(f"\n执行工具: {tool_name}")
-                        print(f"参数:\n {json.dumps(arguments, ensure_ascii=False, indent=2)}")
-                        print(f"执行结果:\n {result_message}")
+                    if self._log_enabled():
+                        logger.info(
+                            "\n执行工具: %s\n参数:\n %s\n执行结果:\n %s\n",
+                            tool_name,
+                            json.dumps(arguments, ensure_ascii=False, indent=2),
+                            result_message
+                        )
 
                 step = AgentStep(
                     step_number=step_number,
-                    timestamp=datetime.now().isoformat(),
+                    timestamp=timestamp,
                     user_input=original_user_input,
                     llm_response=llm_response,
                     tool_calls=tool_calls,
@@ -237,26 +461,16 @@ class AgentEngine:
                 # 如果LLM返回的是文本响应（而不是工具调用），说明任务已完成
                 
                 # 检查之前的步骤是否有工具执行
-                has_previous_tools = any(
-                    step.tool_calls for step in self._execution_steps
-                )
+                has_previous_tools = self._total_tool_calls > 0
                 
-                # 检查最近的工具执行结果是否成功
-                recent_tool_success = False
-                for msg in reversed(self._conversation_history):
-                    if msg.role == MessageRole.TOOL:
-                        tool_content = msg.content
-                        if ("success" in tool_content.lower() or 
-                            "已创建" in tool_content or
-                            "已保存" in tool_content):
-                            recent_tool_success = True
-                            break
+                # 检查之前的工具执行结果是否成功
+                recent_tool_success = self._tool_success_seen
                 
                 if has_previous_tools or recent_tool_success:
                     # 之前执行过工具且成功，现在返回文本响应，任务完成
                     step = AgentStep(
                         step_number=step_number,
-                        timestamp=datetime.now().isoformat(),
+                        timestamp=timestamp,
                         user_input=original_user_input,
                         llm_response=llm_response,
                         tool_calls=[],
@@ -268,7 +482,7 @@ class AgentEngine:
                 elif self._is_final_response(llm_response, original_user_input):
                     step = AgentStep(
                         step_number=step_number,
-                        timestamp=datetime.now().isoformat(),
+                        timestamp=timestamp,
                         user_input=original_user_input,
                         llm_response=llm_response,
                         tool_calls=[],
@@ -281,7 +495,7 @@ class AgentEngine:
                     # 可能是简单的问答，不需要工具
                     step = AgentStep(
                         step_number=step_number,
-                        timestamp=datetime.now().isoformat(),
+                        timestamp=timestamp,
                         user_input=original_user_input,
                         llm_response=llm_response,
                         tool_calls=[],
@@ -291,15 +505,19 @@ class AgentEngine:
                         thinking=thinking_content
                     )
             
-            self._execution_steps.append(step)
+            self._record_step(step)
             return step
             
         except Exception as e:
-            error_msg = f"执行出错: {str(e)}\n{traceback.format_exc()}"
+            # 格式化堆栈需要遍历所有栈帧，只在输出执行过程时附带
+            if self.config.verbose_output:
+                error_msg = f"执行出错: {str(e)}\n{traceback.format_exc()}"
+            else:
+                error_msg = f"执行出错: {str(e)}"
             
             step = AgentStep(
                 step_number=step_number,
-                timestamp=datetime.now().isoformat(),
+                timestamp=timestamp,
                 user_input=original_user_input,
                 llm_response=llm_response,
                 tool_calls=tool_calls,
@@ -309,9 +527,257 @@ class AgentEngine:
                 thinking=thinking_content
             )
             
-            self._execution_steps.append(step)
+            self._record_step(step)
             return step
     
+    def _reset_step_stats(self):
+        """清零按步骤累计的统计"""
+        self._total_steps = 0
+        self._successful_steps = 0
+        self._total_tool_calls = 0
+        self._successful_tool_calls = 0
+        self._any_completed = False
+
+    def _record_step(self, step: AgentStep):
+        """保存步骤（只保留最近 max_kept_steps 个）并累计统计"""
+        self._execution_steps.append(step)
+        successful_calls = sum(1 for r in step.tool_results if r.success)
+        self._total_steps += 1
+        if step.is_completed or successful_calls:
+            self._successful_steps += 1
+        self._total_tool_calls += len(step.tool_calls)
+        self._successful_tool_calls += successful_calls
+        self._any_completed = self._any_completed or step.is_completed
+
+    def _parse_call(self, call: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """提取工具名称和参数（支持OpenAI格式）"""
+        if isinstance(call, dict) and "function" in call:
+            tool_name = call.get("function", {}).get("name", "")
+            args_data = call.get("function", {}).get("arguments", {})
+            if isinstance(args_data, str):
+                try:
+                    arguments = _json_loads(args_data)
+                except json.JSONDecodeError:
+                    arguments = {"raw": args_data}
+            else:
+                arguments = args_data
+        else:
+            tool_name = call.get("name", "")
+            arguments = call.get("arguments", {})
+        return tool_name, arguments
+
+    def _request_llm(self, tools: List[Dict[str, Any]]) -> Tuple[LLMResponse, Dict[int, Future]]:
+        """
+        请求LLM，启用响应缓存时先查缓存
+
+        只有最后一条消息来自用户时才使用缓存；工具结果之后的请求依赖执行环境，每次都重新请求。
+        """
+        cache_key = None
+        history = self._conversation_history
+        if self._response_cache is not None and history and history[-1].role == MessageRole.USER:
+            cache_key = ResponseCache.make_key(
+                history,
+                tools,
+                model=getattr(self.llm_engine, "model", ""),
+                temperature=0.1
+            )
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                if self._log_enabled():
+                    logger.info("使用缓存的LLM响应\n")
+                    if cached.thinking and self.config.stream_response:
+                        logger.info("思考过程:\n%s\n%s\n", cached.thinking, "-" * 60)
+                return cached, {}
+
+        prefetched: Dict[int, Future] = {}
+        if self.config.stream_response:
+            response, prefetched = self._stream_llm(tools)
+        else:
+            response = self.llm_engine.chat(
+                history,
+                tools=tools,
+                temperature=0.1
+            )
+
+        # 被中断时流式响应可能不完整，不写入缓存
+        if cache_key is not None and isinstance(response, LLMResponse) and self._is_running:
+            self._response_cache.set(cache_key, response)
+        return response, prefetched
+
+    def _stream_llm(self, tools: List[Dict[str, Any]]) -> Tuple[LLMResponse, Dict[int, Future]]:
+        """
+        以流式方式请求LLM
+
+        思考过程边生成边输出；当某个工具调用的参数接收完毕（下一个调用开始）时，
+        若它及之前的调用都是只读工具，立即提交到线程池执行，与后续生成重叠。
+
+        Returns:
+            (LLMResponse, 已提前提交的工具调用 {调用位置: Future})
+        """
+        content_parts: List[str] = []
+        thinking_parts: List[str] = []
+        calls: Dict[int, Dict[str, Any]] = {}
+        # 按调用的index记录已提交的Future，返回前再换算为调用位置
+        submitted: Dict[int, Future] = {}
+        last_index: Optional[int] = None
+        can_prefetch = True
+        log_enabled = self._log_enabled()
+        on_token = self._on_token
+
+        def dispatch_completed(upto: int):
+            # 提供方的index不一定从0开始、也可能不连续，只按已出现的index顺序处理
+            nonlocal can_prefetch
+            for key in sorted(calls):
+                if not can_prefetch or key >= upto:
+                    break
+                if key in submitted:
+                    continue
+                tool_name, arguments = self._parse_call(calls[key])
+                if tool_name not in PARALLEL_SAFE_TOOLS:
+                    can_prefetch = False
+                    break
+                submitted[key] = self._tool_pool.submit(
+                    self.tool_executor.execute_tool, tool_name, arguments
+                )
+
+        for delta in self.llm_engine.chat_stream_deltas(
+            self._conversation_history,
+            tools=tools,
+            temperature=0.1
+        ):
+            # stop() 可能由另一个线程调用（如Ctrl-C），不必等整段回复生成完
+            if not self._is_running:
+                break
+            reasoning = delta.get("reasoning_content")
+            if reasoning:
+                if log_enabled:
+                    if not thinking_parts:
+                        logger.info("思考过程:\n")
+                    logger.info(reasoning)
+                thinking_parts.append(reasoning)
+
+            content = delta.get("content")
+            if content:
+                content_parts.append(content)
+                if on_token is not None:
+                    on_token(content)
+
+            for call_delta in delta.get("tool_calls") or []:
+                index = call_delta.get("index")
+                if index is None:
+                    # 没有index的片段属于最近的调用；只有带着新id时才视为新调用
+                    new_id = call_delta.get("id")
+                    if last_index is None or (new_id and calls[last_index]["id"] not in ("", new_id)):
+                        index = max(calls) + 1 if calls else 0
+                    else:
+                        index = last_index
+                last_index = index
+                if index not in calls:
+                    # 新的调用开始，说明之前的调用参数已经完整
+                    dispatch_completed(index)
+                    calls[index] = {
+                        "id": "",
+                        "type": call_delta.get("type", "function"),
+                        "function": {"name": "", "arguments": ""}
+                    }
+                call = calls[index]
+                if call_delta.get("id"):
+                    call["id"] = call_delta["id"]
+                function = call_delta.get("function") or {}
+                if function.get("name"):
+                    call["function"]["name"] += function["name"]
+                arguments = function.get("arguments")
+                if isinstance(arguments, str):
+                    call["function"]["arguments"] += arguments
+                elif arguments:
+                    call["function"]["arguments"] = arguments
+
+        if log_enabled and thinking_parts:
+            logger.info("\n%s\n", "-" * 60)
+
+        order = sorted(calls)
+        tool_calls = [calls[i] for i in order]
+        prefetched = {
+            position: submitted[key]
+            for position, key in enumerate(order)
+            if key in submitted
+        }
+        response = LLMResponse(
+            content="".join(content_parts),
+            thinking="".join(thinking_parts) or None,
+            tool_calls=tool_calls or None
+        )
+        return response, prefetched
+
+    def _run_tools(
+        self,
+        parsed_calls: List[Tuple[str, Dict[str, Any]]],
+        prefetched: Optional[Dict[int, Future]] = None
+    ) -> List[ToolResult]:
+        """
+        执行一组工具调用，结果与调用顺序一一对应
+
+        相邻的只读工具并发执行；有副作用的工具（write/edit/bash等）作为屏障按顺序执行，
+        避免同一轮中先写后读的调用被打乱顺序。
+
+        Args:
+            parsed_calls: (工具名称, 参数) 列表
+            prefetched: 流式阶段已提交执行的调用 {调用位置: Future}
+        """
+        prefetched = prefetched or {}
+        results: List[ToolResult] = []
+        batch: List[Tuple[int, str, Dict[str, Any]]] = []
+
+        for position, (tool_name, arguments) in enumerate(parsed_calls):
+            if tool_name in PARALLEL_SAFE_TOOLS:
+                batch.append((position, tool_name, arguments))
+                continue
+            results.extend(self._run_tool_batch(batch, prefetched))
+            batch = []
+            results.append(self._run_tool_safely(tool_name, arguments))
+
+        results.extend(self._run_tool_batch(batch, prefetched))
+        return results
+
+    def _run_tool_batch(
+        self,
+        batch: List[Tuple[int, str, Dict[str, Any]]],
+        prefetched: Dict[int, Future]
+    ) -> List[ToolResult]:
+        """并发执行一批只读工具，单个失败不影响其他调用"""
+        if len(batch) == 1 and batch[0][0] not in prefetched:
+            _, name, args = batch[0]
+            return [self._run_tool_safely(name, args)]
+
+        futures = [
+            prefetched.get(position) or self._tool_pool.submit(self.tool_executor.execute_tool, name, args)
+            for position, name, args in batch
+        ]
+        results = []
+        for (_, name, _), future in zip(batch, futures):
+            try:
+                results.append(future.result(timeout=self.config.tool_timeout))
+            except Exception as e:
+                results.append(self._tool_error_result(name, e))
+        return results
+
+    def _run_tool_safely(self, tool_name: str, arguments: Dict[str, Any]) -> ToolResult:
+        """在当前线程执行单个工具"""
+        try:
+            return self.tool_executor.execute_tool(tool_name, arguments)
+        except Exception as e:
+            return self._tool_error_result(tool_name, e)
+
+    def _tool_error_result(self, tool_name: str, error: Exception) -> ToolResult:
+        """构造工具执行异常的结果"""
+        return ToolResult(
+            success=False,
+            content="",
+            error=f"工具执行异常: {error}",
+            tool_name=tool_name,
+            timestamp=datetime.now().isoformat()
+        )
+
     def _parse_tool_calls(self, response: str) -> List[Dict[str, Any]]:
         """
         解析LLM响应中的工具调用
@@ -323,7 +789,7 @@ class AgentEngine:
         """
         # 首先尝试解析JSON
         try:
-            data = json.loads(response)
+            data = _json_loads(response)
             
             # 如果是工具调用格式
             if "tool_calls" in data and isinstance(data["tool_calls"], list):
@@ -356,18 +822,10 @@ class AgentEngine:
     
     def _extract_tool_calls_from_text(self, text: str) -> List[Dict[str, Any]]:
         """从文本中提取工具调用信息"""
-        import re
-        
         calls = []
         
-        patterns = [
-            r'调用工具["：:]\s*(\w+)\s*参数?\s*[:：]?\s*(\{[^}]+\})',
-            r'使用工具["：:]\s*(\w+)\s*\(([^)]+)\)',
-            r'"name":\s*"(\w+)"[^}]*"arguments":\s*(\{[^}]+\})',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.DOTALL)
+        for pattern in _TOOL_CALL_PATTERNS:
+            matches = pattern.findall(text)
             for match in matches:
                 if len(match) >= 2:
                     try:
@@ -383,11 +841,76 @@ class AgentEngine:
         
         return calls
     
+    def _compact_history(self):
+        """
+        对话历史超过 max_history_messages 时压缩中间部分
+
+        开头固定的消息保留，最近的一半消息保留，其余（包括之前的摘要）合并为一条摘要消息，
+        使每次请求的上下文长度有上限。保留部分从非TOOL消息开始，不拆开工具调用和它的结果。
+        """
+        history = self._conversation_history
+        limit = self.config.max_history_messages
+        if limit <= 0 or len(history) <= limit:
+            return
+
+        pinned = self._pinned_messages
+        keep = max(1, limit // 2)
+        cut = len(history) - keep
+        while cut < len(history) and history[cut].role == MessageRole.TOOL:
+            cut += 1
+        if cut <= pinned:
+            return
+
+        # 之前生成的摘要消息位于固定消息之后，会并入新的摘要
+        lines = [self._summarize_message(msg) for msg in islice(history, pinned, cut)]
+        omitted = "...（更早的步骤已省略）"
+        lines = [line for line in "\n".join(lines).split("\n") if line != omitted]
+        if len(lines) > limit:
+            lines = [omitted] + lines[-limit:]
+
+        recent = list(islice(history, cut, None))
+        head = list(islice(history, 0, pinned))
+        history.clear()
+        history.extend(head)
+        history.append(Message(
+            role=MessageRole.USER,
+            content="[上下文信息 - 之前步骤的摘要]\n\n" + "\n".join(lines)
+        ))
+        history.extend(recent)
+
+    def _summarize_message(self, msg: Message, limit: int = 200) -> str:
+        """将一条历史消息压缩为一行摘要"""
+        if msg.tool_calls:
+            names = []
+            for call in msg.tool_calls:
+                tool_name, arguments = self._parse_call(call)
+                args_text = json.dumps(arguments, ensure_ascii=False)
+                names.append(f"{tool_name}({args_text[:limit]})")
+            return "调用工具: " + ", ".join(names)
+
+        content = (msg.content or "").strip()
+        if content.startswith("[上下文信息 - 之前步骤的摘要]"):
+            return content.split("\n\n", 1)[-1]
+        first_line = content.split("\n", 1)[0]
+        if msg.role == MessageRole.TOOL:
+            # 工具结果的首行是 "工具 [name] 执行...:"，带上第二行的内容开头
+            parts = content.split("\n", 2)
+            detail = parts[1] if len(parts) > 1 else ""
+            return f"结果: {first_line} {detail[:limit]}".rstrip()
+        label = "助手" if msg.role == MessageRole.ASSISTANT else "用户"
+        return f"{label}: {first_line[:limit]}"
+
     def _add_tool_message(self, content: str):
         """添加工具执行结果到对话历史"""
         self._conversation_history.append(
             Message(role=MessageRole.TOOL, content=content)
         )
+        if not self._tool_success_seen:
+            self._tool_success_seen = (
+                "success" in content.lower() or "已创建" in content or "已保存" in content
+            )
+        if not self._tool_saved_seen:
+            self._tool_saved_seen = "代码已保存" in content or "已创建" in content
     
     def _format_tool_result(self, result: ToolResult) -> str:
         """格式化工具执行结果"""
@@ -404,55 +927,33 @@ class AgentEngine:
         if len(response.strip()) < 10:
             return False
         
-        # 检查响应是否包含典型的最终回答特征
-        final_indicators = [
-            "任务完成", "已经完成", "已完成", 
-            "已经为您创建", "已经为您生成",
-            "文件已创建", "代码已生成", "已成功创建",
-            "代码已保存"
-        ]
-        
-        for indicator in final_indicators:
-            if indicator in response:
-                return True
-        
-        # 检查是否是简单的问答（不涉及文件操作）
-        question_keywords = ["解释", "说明", "什么是", "如何", "为什么"]
-        operation_keywords = ["创建", "生成", "写", "修改", "编辑", "删除", "查看", "请求"]
-        
-        has_question = any(kw in user_input for kw in question_keywords)
-        has_operation = any(kw in user_input for kw in operation_keywords)
-        
-        # 如果用户只是问问题而不是要求操作，且响应回答了问题
-        if has_question and not has_operation:
+        # 检查响应是否包含典型的最终回答特征（单次正则扫描）
+        if _FINAL_INDICATOR_PATTERN.search(response):
             return True
         
-        # 如果用户要求操作但没有工具调用，返回False（应该继续）
-        if has_operation and not self._parse_tool_calls(response):
+        # 用户要求操作但LLM没有返回工具调用（调用方已确认），应该继续
+        if any(kw in user_input for kw in _OPERATION_KEYWORDS):
             return False
         
-        # 检查工具执行结果的历史
-        for msg in reversed(self._conversation_history):
-            if msg.role == MessageRole.TOOL:
-                tool_content = msg.content
-                # 如果工具执行成功保存了文件，认为任务可能完成
-                if "代码已保存" in tool_content or "已创建" in tool_content:
-                    return True
+        # 用户只是问问题而不是要求操作，且响应回答了问题
+        if any(kw in user_input for kw in _QUESTION_KEYWORDS):
+            return True
         
-        return False
+        # 如果工具执行成功保存了文件，认为任务可能完成
+        return self._tool_saved_seen
     
     def _check_limits(self) -> bool:
         """检查执行限制"""
         if self._current_step >= self.config.max_iterations:
-            if self.config.verbose_output:
-                print(f"\n达到最大迭代次数 ({self.config.max_iterations})")
+            if self._log_enabled():
+                logger.info("\n达到最大迭代次数 (%d)\n", self.config.max_iterations)
             return False
         
         if self._start_time:
             elapsed = time.time() - self._start_time
             if elapsed > self.config.max_execution_time:
-                if self.config.verbose_output:
-                    print(f"\n达到最大执行时间 ({self.config.max_execution_time}s)")
+                if self._log_enabled():
+                    logger.info("\n达到最大执行时间 (%ss)\n", self.config.max_execution_time)
                 return False
         
         return True
@@ -460,40 +961,45 @@ class AgentEngine:
     def stop(self):
         """停止执行"""
         self._is_running = False
+
+    def close(self):
+        """
+        关闭工具线程池
+
+        已超时仍在运行的工具无法被中断，这里不等待它们结束，只取消尚未开始的调用。
+        """
+        self._is_running = False
+        self._tool_pool.shutdown(wait=False, cancel_futures=True)
     
     def get_status(self) -> Dict[str, Any]:
         """获取当前状态"""
         return {
             "is_running": self._is_running,
             "current_step": self._current_step,
-            "total_steps": len(self._execution_steps),
+            "total_steps": self._total_steps,
             "elapsed_time": time.time() - self._start_time if self._start_time else 0,
-            "last_step": self._execution_steps[-1].__dict__ if self._execution_steps else None
+            "last_step": asdict(self._execution_steps[-1]) if self._execution_steps else None
         }
     
     def get_execution_summary(self) -> Dict[str, Any]:
-        """获取执行摘要"""
-        successful_steps = sum(1 for s in self._execution_steps if s.is_completed or any(r.success for r in s.tool_results))
-        failed_steps = len(self._execution_steps) - successful_steps
-        total_tool_calls = sum(len(s.tool_calls) for s in self._execution_steps)
-        successful_calls = sum(
-            sum(1 for r in s.tool_results if r.success) 
-            for s in self._execution_steps
-        )
-        
+        """获取执行摘要（由各步骤执行时累计的统计生成）"""
         return {
-            "total_steps": len(self._execution_steps),
-            "successful_steps": successful_steps,
-            "failed_steps": failed_steps,
-            "total_tool_calls": total_tool_calls,
-            "successful_tool_calls": successful_calls,
+            "total_steps": self._total_steps,
+            "successful_steps": self._successful_steps,
+            "failed_steps": self._total_steps - self._successful_steps,
+            "total_tool_calls": self._total_tool_calls,
+            "successful_tool_calls": self._successful_tool_calls,
             "execution_time": time.time() - self._start_time if self._start_time else 0,
-            "is_completed": any(s.is_completed for s in self._execution_steps),
+            "is_completed": self._any_completed,
             "final_message": None
         }
     
     def _get_default_system_prompt(self) -> str:
-        """获取默认系统提示词"""
+        """获取默认系统提示词（工作目录和工具集在实例生命周期内不变，构建一次后复用）"""
+        return self._default_system_prompt
+
+    def _build_default_system_prompt(self) -> str:
+        """构建默认系统提示词"""
         tool_descriptions = []
         for tool in self._tool_definitions:
             tool_descriptions.append(f"- {tool.name}: {tool.description}")
@@ -636,15 +1142,39 @@ class AgentEngine:
 请始终以工具调用为先导，通过实际操作完成任务，而非仅在响应中描述操作。
 """
     
+    def _current_tools(self) -> List[Dict[str, Any]]:
+        """本步发送给LLM的工具定义"""
+        if not self.config.lazy_tool_schemas:
+            # 工具定义在初始化时已格式化
+            return self._tools_openai
+        if self._lazy_tools is None:
+            # 保持工具顺序不变，已调用过的工具换成完整定义，其余只发送摘要
+            self._lazy_tools = [
+                tool.to_openai_format()
+                if tool.name in self._promoted_tools
+                else {"type": "function", "function": tool.to_summary()}
+                for tool in self._tool_definitions
+            ]
+        return self._lazy_tools
+
+    def _promote_tools(self, tool_names):
+        """将工具切换为发送完整参数schema"""
+        new_names = set(tool_names) - self._promoted_tools
+        if new_names:
+            self._promoted_tools.update(new_names)
+            self._lazy_tools = None
+
     def get_tool_definitions(self, engine_type: str = "openai") -> List[Dict[str, Any]]:
         """获取工具定义（指定格式）"""
+        if engine_type == "openai":
+            return self._tools_openai
         return ToolCallingFormatter.format_for_engine(engine_type, self._tool_definitions)
     
-    def get_conversation_history(self) -> List[Message]:
-        """获取对话历史"""
-        return self._conversation_history.copy()
+    def get_conversation_history(self) -> Sequence[Message]:
+        """获取对话历史（只读视图，需要快照时调用方自行 list()）"""
+        return SequenceView(self._conversation_history)
     
-    def get_execution_steps(self) -> List[AgentStep]:
-        """获取执行步骤"""
-        return self._execution_steps.copy()
+    def get_execution_steps(self) -> Sequence[AgentStep]:
+        """获取最近的执行步骤（最多 max_kept_steps 个；只读视图，需要快照时调用方自行 list()）"""
+        return SequenceView(self._execution_steps)
 
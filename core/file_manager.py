@@ -2,6 +2,9 @@
 文件管理器 - 安全地读写文件
 """
 import os
+import glob
+import stat
+import shutil
 import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -17,7 +20,7 @@ class FileOperation(Enum):
     EDIT = "edit"
 
 
-@dataclass
+@dataclass(slots=True)
 class FileChange:
     """文件变更记录"""
     operation: FileOperation
@@ -27,13 +30,20 @@ class FileChange:
     new_content: str = ""
     success: bool = False
     error_message: str = ""
+    backup_path: str = ""
 
     def __post_init__(self):
         if not self.timestamp:
             self.timestamp = datetime.datetime.now().isoformat()
 
+    def load_original_content(self, encoding: str = "utf-8") -> str:
+        """获取变更前的内容（覆盖写入时按需从备份文件读取）"""
+        if self.original_content or not self.backup_path:
+            return self.original_content
+        return Path(self.backup_path).read_text(encoding=encoding)
 
-@dataclass
+
+@dataclass(slots=True)
 class FileInfo:
     """文件信息"""
     path: str
@@ -54,9 +64,14 @@ class FileInfo:
 class FileManager:
     """文件管理器"""
 
-    def __init__(self, workdir: str = ".", backup_dir: str | None = None):
+    # 每个文件名最多保留的备份数，超出时删除最旧的
+    MAX_BACKUPS_PER_FILE = 5
+
+    def __init__(self, workdir: str = ".", backup_dir: str | None = None, keep_backups: bool = False):
         self.workdir = Path(workdir).resolve()
         self.backup_dir = Path(backup_dir).resolve() if backup_dir else self.workdir / "backups"
+        # 覆盖写入前是否把原文件复制到备份目录（默认关闭，不在用户项目中留下文件）
+        self.keep_backups = keep_backups
         self.change_history: List[FileChange] = []
 
     def _resolve_path(self, file_path: str) -> Path:
@@ -97,14 +112,36 @@ class FileManager:
         ext = file_path.suffix.lower() if file_path.suffix else ""
         return extension_map.get(ext, 'unknown')
 
+    def _stat(self, path: Path, file_path: str) -> os.stat_result:
+        """获取文件状态，一次系统调用同时完成存在性检查"""
+        try:
+            return path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {file_path}") from None
+
+    def _backup(self, path: Path) -> Path:
+        """
+        将现有文件复制到备份目录
+
+        复制而不是移动：原文件之后原地写入，权限、属主和硬链接都保持不变。
+        """
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
+        backup_path = self.backup_dir / f"{path.name}.{stamp}.bak"
+        shutil.copy2(path, backup_path)
+
+        # 时间戳定长，按文件名排序即按时间排序
+        backups = sorted(self.backup_dir.glob(f"{glob.escape(path.name)}.*.bak"))
+        for old in backups[:-self.MAX_BACKUPS_PER_FILE]:
+            old.unlink(missing_ok=True)
+        return backup_path
+
     def read_file(self, file_path: str, encoding: str = "utf-8") -> Tuple[str, FileInfo]:
         """读取文件"""
         path = self._resolve_path(file_path)
+        st = self._stat(path, file_path)
 
-        if not path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-
-        if path.is_dir():
+        if stat.S_ISDIR(st.st_mode):
             raise IsADirectoryError(f"Path is a directory: {file_path}")
 
         content = path.read_text(encoding=encoding)
@@ -113,9 +150,9 @@ class FileManager:
             path=str(path.absolute()),
             name=path.name,
             extension=path.suffix.lower(),
-            size=len(content.encode(encoding)),
-            created_at=datetime.datetime.fromtimestamp(path.stat().st_ctime).isoformat(),
-            modified_at=datetime.datetime.fromtimestamp(path.stat().st_mtime).isoformat(),
+            size=st.st_size,
+            created_at=datetime.datetime.fromtimestamp(st.st_ctime).isoformat(),
+            modified_at=datetime.datetime.fromtimestamp(st.st_mtime).isoformat(),
             content=content,
             encoding=encoding,
             language=self._detect_language(path),
@@ -141,34 +178,44 @@ class FileManager:
         """写入文件"""
         path = self._resolve_path(file_path)
 
+        if path.is_dir():
+            raise IsADirectoryError(f"Path is a directory: {file_path}")
+
         if auto_create_dir:
             path.parent.mkdir(parents=True, exist_ok=True)
 
-        original_content = ""
-        if path.exists():
-            original_content = path.read_text(encoding=encoding)
+        # 只判断文件是否存在，不读取原内容；开启备份时才复制原文件
+        existed = path.exists()
+        backup_path = self._backup(path) if existed and self.keep_backups else None
 
-        path.write_text(content, encoding=encoding)
+        data = content.encode(encoding)
+        now_iso = datetime.datetime.now().isoformat()
+        try:
+            path.write_bytes(data)
+        except Exception:
+            if backup_path:
+                shutil.copyfile(backup_path, path)
+            raise
 
         info = FileInfo(
             path=str(path.absolute()),
             name=path.name,
             extension=path.suffix.lower(),
-            size=len(content.encode(encoding)),
-            created_at=datetime.datetime.now().isoformat(),
-            modified_at=datetime.datetime.now().isoformat(),
+            size=len(data),
+            created_at=now_iso,
+            modified_at=now_iso,
             content=content,
             encoding=encoding,
             language=self._detect_language(path),
         )
 
         change = FileChange(
-            operation=FileOperation.WRITE if not original_content else FileOperation.EDIT,
+            operation=FileOperation.EDIT if existed else FileOperation.WRITE,
             file_path=str(path.absolute()),
-            timestamp=datetime.datetime.now().isoformat(),
-            original_content=original_content,
+            timestamp=now_iso,
             new_content=content,
             success=True,
+            backup_path=str(backup_path) if backup_path else "",
         )
         self.change_history.append(change)
 
@@ -183,29 +230,32 @@ class FileManager:
     ) -> FileInfo:
         """编辑文件内容"""
         path = self._resolve_path(file_path)
-
-        if not path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
+        st = self._stat(path, file_path)
 
         content = path.read_text(encoding='utf-8')
         original_content = content
 
-        if replace_all:
+        index = content.find(old_text)
+        if index < 0:
+            if not replace_all:
+                raise ValueError(f"Text not found in file: {old_text}")
+            new_content = content
+        elif replace_all and content.find(old_text, index + len(old_text)) >= 0:
             new_content = content.replace(old_text, new_text)
         else:
-            if old_text not in content:
-                raise ValueError(f"Text not found in file: {old_text}")
-            new_content = content.replace(old_text, new_text, 1)
+            new_content = content[:index] + new_text + content[index + len(old_text):]
 
-        path.write_text(new_content, encoding='utf-8')
+        data = new_content.encode('utf-8')
+        path.write_bytes(data)
+        now_iso = datetime.datetime.now().isoformat()
 
         info = FileInfo(
             path=str(path.absolute()),
             name=path.name,
             extension=path.suffix.lower(),
-            size=len(new_content.encode('utf-8')),
-            created_at=datetime.datetime.fromtimestamp(path.stat().st_ctime).isoformat(),
-            modified_at=datetime.datetime.now().isoformat(),
+            size=len(data),
+            created_at=datetime.datetime.fromtimestamp(st.st_ctime).isoformat(),
+            modified_at=now_iso,
             content=new_content,
             encoding="utf-8",
             language=self._detect_language(path),
@@ -214,7 +264,7 @@ class FileManager:
         change = FileChange(
             operation=FileOperation.EDIT,
             file_path=str(path.absolute()),
-            timestamp=datetime.datetime.now().isoformat(),
+            timestamp=now_iso,
             original_content=original_content,
             new_content=new_content,
             success=True,
@@ -1,17 +1,52 @@
 """
 大模型引擎 - 支持多种模型接口
 """
+import asyncio
+import functools
+import gzip
+import hashlib
 import json
+import re
+import threading
+import os
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Iterator
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 from dataclasses import dataclass as dc
 
 from config import MODEL_CONFIG
+from core.tool_definitions import ToolCallingFormatter, get_all_tool_definitions
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+
+# 默认工具集的OpenAI格式列表及其预先序列化的JSON
+_DEFAULT_TOOLS = ToolCallingFormatter.format_for_engine("openai", get_all_tool_definitions())
+_DEFAULT_TOOLS_JSON = ToolCallingFormatter.to_openai_json().encode("utf-8")
+
+
+def _encode_body(payload: Dict[str, Any]) -> bytes:
+    """将请求体序列化为UTF-8 JSON字节，优先使用orjson；默认工具集直接拼接预先序列化的结果"""
+    if payload.get("tools") is _DEFAULT_TOOLS:
+        body = _encode_body({key: value for key, value in payload.items() if key != "tools"})
+        return body[:-1] + b',"tools":' + _DEFAULT_TOOLS_JSON + b"}"
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            pass
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
 
 
 class MessageRole(Enum):
@@ -39,6 +74,161 @@ class LLMResponse:
     tool_calls: Optional[List[Dict[str, Any]]] = None
 
 
+def _iter_stream_chunks(response: requests.Response) -> Iterator[Dict[str, Any]]:
+    """
+    解析SSE流式响应，逐个返回数据块
+
+    直接在字节上匹配前缀并解析JSON，不先解码成字符串。
+    """
+    for line in response.iter_lines():
+        if line.startswith(b"data: "):
+            data = line[6:]
+            if data != b"[DONE]":
+                yield _json_loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding():
+    """
+    获取tiktoken编码器（首次使用时加载）
+
+    未安装tiktoken或编码表加载失败时返回None，由调用方退回到估算。
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def _estimate_tokens(text: str) -> int:
+    """估算token数量（英文约4字符/token，中文约2字符/token）"""
+    if text.isascii():
+        return len(text) // 4
+    # 丢弃非ASCII字符后的长度差即非ASCII字符数，两步都在C层完成
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    chinese_chars = len(text) - ascii_chars
+    return int(chinese_chars / 2 + ascii_chars / 4)
+
+
+class ResponseCache:
+    """
+    LLM响应磁盘缓存
+
+    以 (对话历史, 工具定义, 温度等参数) 的哈希为键，每个响应保存为缓存目录下的一个JSON文件，
+    超过有效期的条目视为未命中。
+    """
+
+    def __init__(self, cache_dir: str, ttl: float = 86400.0):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(messages: List[Message], tools: Optional[List[Dict[str, Any]]] = None, **params) -> str:
+        """根据请求内容计算缓存键"""
+        payload = {
+            "messages": [
+                [msg.role.value, msg.content, msg.tool_calls] for msg in messages
+            ],
+            "tools": tools,
+            "params": params,
+        }
+        data = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[LLMResponse]:
+        """读取缓存，不存在或已过期时返回None"""
+        path = self._path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return LLMResponse(
+            content=data.get("content", ""),
+            thinking=data.get("thinking"),
+            tool_calls=data.get("tool_calls")
+        )
+
+    def set(self, key: str, response: LLMResponse):
+        """写入缓存，先写临时文件再替换，避免读到不完整的内容"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        data = {
+            "content": response.content,
+            "thinking": response.thinking,
+            "tool_calls": response.tool_calls,
+        }
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+# TOOL消息开头的工具名（格式：工具 [xxx] 执行信息:），用于生成tool_call_id
+_TOOL_NAME_RE = re.compile(r'工具 \[(\w+)\]')
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_GZIP_JSON_HEADERS = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+
+# 请求体超过该大小时使用gzip压缩（字节）
+GZIP_MIN_BYTES = 1024
+
+# 单个主机保持的最大连接数，并发请求（achat / 多个Agent）超过默认的10个时不必反复建立TLS连接
+HTTP_POOL_MAXSIZE = 64
+
+
+_SESSION_CACHE: Dict[Tuple[str, str], requests.Session] = {}
+_SESSION_LOCK = threading.Lock()
+
+
+def _get_session(api_base: str, api_key: str) -> requests.Session:
+    """
+    获取共享的HTTP会话
+
+    按 (api_base, api_key) 缓存，多个引擎实例复用同一个连接池，避免每次创建引擎都重新握手。
+    连接失败和限流/服务暂不可用（429/503）自动重试最多两次。
+    """
+    key = (api_base, api_key)
+    session = _SESSION_CACHE.get(key)
+    if session is not None:
+        return session
+
+    with _SESSION_LOCK:
+        session = _SESSION_CACHE.get(key)
+        if session is None:
+            session = requests.Session()
+            retry = Retry(
+                total=2,
+                read=0,  # 读超时时服务端可能已在生成，不重复提交
+                backoff_factor=0.2,
+                # 502/504 时上游可能已经生成并计费，只重试明确表示未处理的状态码
+                status_forcelist=(429, 503),
+                respect_retry_after_header=True,
+                allowed_methods=frozenset({"POST"}),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+            if api_key:
+                session.headers.update({"Authorization": f"Bearer {api_key}"})
+            _SESSION_CACHE[key] = session
+    return session
+
+
 class LLMEngine(ABC):
     """大模型引擎基类"""
     
@@ -57,9 +247,87 @@ class LLMEngine(ABC):
         """计算token数量"""
         pass
 
+    async def achat(self, messages: List[Message], **kwargs) -> LLMResponse:
+        """
+        异步单轮对话
+
+        请求在线程中执行，等待期间不阻塞事件循环，多个请求可以用 asyncio.gather 并发。
+        """
+        return await asyncio.to_thread(self.chat, messages, **kwargs)
+
+    def warmup(self, timeout: float = 15) -> float:
+        """
+        预热引擎：加载分词器并发送一个只生成1个token的请求
+
+        让首个真实请求不再承担TLS握手、连接池建立等一次性开销。
+        预热失败不影响后续使用，异常直接抛给调用方决定是否忽略。
+
+        Returns:
+            float: 预热耗时（秒）
+        """
+        start = time.perf_counter()
+        self.count_tokens("warmup")
+        self.chat([Message(role=MessageRole.USER, content="hi")], max_tokens=1, timeout=timeout)
+        return time.perf_counter() - start
+
+    async def achat_stream(self, messages: List[Message], **kwargs) -> AsyncIterator[str]:
+        """异步流式对话，由后台线程读取响应并逐段交给事件循环"""
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in self.chat_stream(messages, **kwargs):
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, done)
+
+        threading.Thread(target=produce, name="llm-stream", daemon=True).start()
+        while True:
+            chunk = await chunks.get()
+            if chunk is done:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def chat_stream_deltas(
+        self,
+        messages: List[Message],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        流式对话（含工具调用），逐个返回OpenAI格式的delta
+
+        默认实现退化为一次性请求，子类可覆盖为真正的流式接口。
+        """
+        response = self.chat(messages, tools=tools, **kwargs)
+        delta: Dict[str, Any] = {"content": response.content}
+        if response.thinking:
+            delta["reasoning_content"] = response.thinking
+        if response.tool_calls:
+            delta["tool_calls"] = [
+                {**call, "index": i} for i, call in enumerate(response.tool_calls)
+            ]
+        yield delta
+
 
 class OpenAIEngine(LLMEngine):
-    """OpenAI兼容引擎（支持GPT-4、Ollama等）"""
+    """
+    OpenAI兼容引擎（支持GPT-4、Ollama等）
+
+    请求构建、发送和响应解析集中在这里，其他兼容接口的引擎只需覆盖
+    _endpoint / _extra_payload 等钩子。
+    """
+
+    # 未指定timeout时的请求超时（秒）
+    default_timeout = 60
+    # 是否压缩较大的请求体（默认关闭，可通过 MODEL_CONFIG["compress_requests"] 开启；服务端不支持时自动关闭）
+    compress_requests = False
 
     def __init__(
         self,
@@ -74,29 +342,47 @@ class OpenAIEngine(LLMEngine):
         self.temperature = kwargs.get("temperature", MODEL_CONFIG.get("temperature", 0.7))
         self.max_tokens = kwargs.get("max_tokens", MODEL_CONFIG.get("max_tokens", 4096))
         self.top_p = kwargs.get("top_p", MODEL_CONFIG.get("top_p", 0.9))
-
-        self.session = requests.Session()
-        if self.api_key:
-            self.session.headers.update({"Authorization": f"Bearer {self.api_key}"})
+        self.compress_requests = kwargs.get(
+            "compress_requests", MODEL_CONFIG.get("compress_requests", self.compress_requests)
+        )
+        # 压缩请求成功过一次后，说明服务端接受gzip，之后的400不再当作压缩问题重发
+        self._compression_confirmed = False
+
+        self._session: Optional[requests.Session] = None
+
+    @property
+    def session(self) -> requests.Session:
+        """HTTP会话，首次发送请求时才获取"""
+        session = self._session
+        if session is None:
+            session = self._session = _get_session(self.api_base, self.api_key)
+        return session
+
+    @session.setter
+    def session(self, session: requests.Session):
+        self._session = session
     
     def _convert_messages(self, messages: List[Message]) -> List[Dict]:
         """转换消息格式"""
         converted = []
+        assistant_role = MessageRole.ASSISTANT
+        tool_role = MessageRole.TOOL
+        search_tool_name = _TOOL_NAME_RE.search
         for msg in messages:
+            role = msg.role
             msg_dict = {
-                "role": msg.role.value,
+                "role": role.value,
                 "content": msg.content or ""
             }
             
             # 如果是ASSISTANT角色且有tool_calls，添加tool_calls
-            if msg.role == MessageRole.ASSISTANT and msg.tool_calls:
+            if role is assistant_role and msg.tool_calls:
                 msg_dict["tool_calls"] = msg.tool_calls
             
             # 如果是TOOL角色，添加tool_call_id
-            if msg.role == MessageRole.TOOL:
+            elif role is tool_role:
                 # 从内容中提取tool_call_id（格式：工具 [xxx] 执行成功:）
-                import re
-                match = re.search(r'工具 \[(\w+)\]', msg.content)
+                match = search_tool_name(msg.content)
                 if match:
                     tool_name = match.group(1)
                     msg_dict["tool_call_id"] = f"call_{tool_name}"
@@ -106,35 +392,93 @@ class OpenAIEngine(LLMEngine):
             converted.append(msg_dict)
         
         return converted
-    
-    def chat(
+
+    def _endpoint(self) -> str:
+        """对话接口地址"""
+        return f"{self.api_base}/chat/completions"
+
+    def _build_payload(
         self,
         messages: List[Message],
         tools: Optional[List[Dict[str, Any]]] = None,
+        stream: bool = False,
         **kwargs
-    ) -> LLMResponse:
-        """发送对话请求"""
+    ) -> Dict[str, Any]:
+        """构建请求体"""
         payload = {
             "model": self.model,
             "messages": self._convert_messages(messages),
             "temperature": kwargs.get("temperature", self.temperature),
             "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-            "top_p": kwargs.get("top_p", self.top_p),
         }
+        top_p = kwargs.get("top_p", self.top_p)
+        if top_p is not None:
+            payload["top_p"] = top_p
+        if stream:
+            payload["stream"] = True
 
         if tools:
             payload["tools"] = tools
             if "temperature" not in kwargs:
                 payload["temperature"] = 0
 
+        self._extra_payload(payload)
+        return payload
+
+    def _extra_payload(self, payload: Dict[str, Any]):
+        """添加引擎特有的请求参数"""
+        pass
+
+    def _post(self, payload: Dict[str, Any], stream: bool = False, **kwargs) -> requests.Response:
+        """
+        发送请求并检查状态码
+
+        开启压缩时较大的请求体用gzip压缩；服务端尚未接受过压缩请求时，
+        415/400 改为不压缩重发，重发成功后该引擎之后的请求都不再压缩。
+        """
+        # 预先序列化为字节，重试时复用同一份请求体
+        body = _encode_body(payload)
+        timeout = kwargs.get("timeout", self.default_timeout)
+
+        if self.compress_requests and len(body) > GZIP_MIN_BYTES:
+            response = self.session.post(
+                self._endpoint(),
+                data=gzip.compress(body, compresslevel=5),
+                headers=_GZIP_JSON_HEADERS,
+                stream=stream,
+                timeout=timeout
+            )
+            if self._compression_confirmed or response.status_code not in (400, 415):
+                response.raise_for_status()
+                self._compression_confirmed = True
+                return response
+            response.close()
+
+            response = self.session.post(
+                self._endpoint(),
+                data=body,
+                headers=_JSON_HEADERS,
+                stream=stream,
+                timeout=timeout
+            )
+            if response.ok:
+                self.compress_requests = False
+            response.raise_for_status()
+            return response
+
         response = self.session.post(
-            f"{self.api_base}/chat/completions",
-            json=payload,
-            timeout=kwargs.get("timeout", 60)
+            self._endpoint(),
+            data=body,
+            headers=_JSON_HEADERS,
+            stream=stream,
+            timeout=timeout
         )
         response.raise_for_status()
-        result = response.json()
+        return response
 
+    @staticmethod
+    def _parse_response(result: Dict[str, Any]) -> LLMResponse:
+        """解析非流式响应"""
         if result.get("choices") and len(result["choices"]) > 0:
             message = result["choices"][0].get("message", {})
             thinking_content = message.get("reasoning_content", None)
@@ -152,43 +496,47 @@ class OpenAIEngine(LLMEngine):
             )
 
         return LLMResponse(content="")
+    
+    def chat(
+        self,
+        messages: List[Message],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> LLMResponse:
+        """发送对话请求"""
+        response = self._post(self._build_payload(messages, tools, **kwargs), **kwargs)
+        return self._parse_response(_json_loads(response.content))
 
     def chat_stream(self, messages: List[Message], **kwargs) -> Iterator[str]:
         """流式对话"""
-        payload = {
-            "model": self.model,
-            "messages": self._convert_messages(messages),
-            "temperature": kwargs.get("temperature", self.temperature),
-            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-            "top_p": kwargs.get("top_p", self.top_p),
-            "stream": True,
-        }
+        # 请求体不保存在生成器的局部变量里，发送后即可释放，不必存活到流结束
+        response = self._post(self._build_payload(messages, stream=True, **kwargs), stream=True, **kwargs)
         
-        response = self.session.post(
-            f"{self.api_base}/chat/completions",
-            json=payload,
-            stream=True,
-            timeout=kwargs.get("timeout", 60)
-        )
-        response.raise_for_status()
-        
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    data = line[6:]
-                    if data != '[DONE]':
-                        chunk = json.loads(data)
-                        if chunk.get("choices"):
-                            content = chunk["choices"][0]["delta"].get("content", "")
-                            if content:
-                                yield content
+        for chunk in _iter_stream_chunks(response):
+            if chunk.get("choices"):
+                content = chunk["choices"][0]["delta"].get("content", "")
+                if content:
+                    yield content
     
+    def chat_stream_deltas(
+        self,
+        messages: List[Message],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> Iterator[Dict[str, Any]]:
+        """流式对话（含工具调用）"""
+        response = self._post(self._build_payload(messages, tools, stream=True, **kwargs), stream=True, **kwargs)
+
+        for chunk in _iter_stream_chunks(response):
+            if chunk.get("choices"):
+                yield chunk["choices"][0].get("delta", {})
+
     def count_tokens(self, text: str) -> int:
-        """估算token数量（英文约4字符/token，中文约2字符/token）"""
-        chinese_chars = sum(1 for char in text if ord(char) > 127)
-        english_chars = len(text) - chinese_chars
-        return int(chinese_chars / 2 + english_chars / 4)
+        """计算token数量（使用cl100k_base编码，tiktoken不可用时估算）"""
+        encoding = _get_encoding()
+        if encoding is None:
+            return _estimate_tokens(text)
+        return len(encoding.encode(text, disallowed_special=()))
 
 
 class QwenEngine(OpenAIEngine):
@@ -214,179 +562,36 @@ class QwenEngine(OpenAIEngine):
         model_lower = self.model.lower()
         return "qwen" in model_lower or "qwq" in model_lower
 
-    def chat(
-        self,
-        messages: List[Message],
-        tools: Optional[List[Dict[str, Any]]] = None,
-        **kwargs
-    ) -> LLMResponse:
-        payload = {
-            "model": self.model,
-            "messages": self._convert_messages(messages),
-            "temperature": kwargs.get("temperature", self.temperature),
-            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-            "top_p": kwargs.get("top_p", self.top_p),
-        }
-
-        if tools:
-            payload["tools"] = tools
-            if "temperature" not in kwargs:
-                payload["temperature"] = 0
-
+    def _extra_payload(self, payload: Dict[str, Any]):
         if self._is_qwen_model() and self.enable_thinking:
             payload["enable_thinking"] = True
 
-        response = self.session.post(
-            f"{self.api_base}/chat/completions",
-            json=payload,
-            timeout=kwargs.get("timeout", 60)
-        )
-        response.raise_for_status()
-        result = response.json()
-
-        if result.get("choices") and len(result["choices"]) > 0:
-            message = result["choices"][0].get("message", {})
-            thinking_content = message.get("reasoning_content", None)
-
-            if "tool_calls" in message:
-                return LLMResponse(
-                    content="",
-                    thinking=thinking_content,
-                    tool_calls=message["tool_calls"]
-                )
-
-            return LLMResponse(
-                content=message.get("content", ""),
-                thinking=thinking_content
-            )
-
-        return LLMResponse(content="")
 
-
-
-class BigModelEngine(LLMEngine):
+class BigModelEngine(OpenAIEngine):
     """智谱AI BigModel引擎"""
 
+    default_timeout = 120
+
     def __init__(
         self,
         api_key: Optional[str] = None,
         model: str = "glm-4.7",
         **kwargs
     ):
-        self.api_key = api_key or MODEL_CONFIG.get("api_key", "")
-        self.model = model or MODEL_CONFIG.get("model", "")
-        self.temperature = kwargs.get("temperature", MODEL_CONFIG.get("temperature", 0.7))
-        self.max_tokens = kwargs.get("max_tokens", MODEL_CONFIG.get("max_tokens", 4096))
-        self.enable_thinking = kwargs.get("enable_thinking", MODEL_CONFIG.get("enable_thinking", True))
-
-        self.session = requests.Session()
-        if self.api_key:
-            self.session.headers.update({"Authorization": f"Bearer {self.api_key}"})
-
-    def _convert_messages(self, messages: List[Message]) -> List[Dict]:
-        converted = []
-        for msg in messages:
-            msg_dict = {
-                "role": msg.role.value,
-                "content": msg.content or ""
-            }
-            if msg.role == MessageRole.ASSISTANT and msg.tool_calls:
-                msg_dict["tool_calls"] = msg.tool_calls
-            if msg.role == MessageRole.TOOL:
-                import re
-                match = re.search(r'工具 \[(\w+)\]', msg.content)
-                if match:
-                    tool_name = match.group(1)
-                    msg_dict["tool_call_id"] = f"call_{tool_name}"
-                else:
-                    msg_dict["tool_call_id"] = f"call_{len(converted)}"
-            converted.append(msg_dict)
-        return converted
-
-    def chat(
-        self,
-        messages: List[Message],
-        tools: Optional[List[Dict[str, Any]]] = None,
-        **kwargs
-    ) -> LLMResponse:
-        payload = {
-            "model": self.model,
-            "messages": self._convert_messages(messages),
-            "temperature": kwargs.get("temperature", self.temperature),
-            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-        }
-
-        if tools:
-            payload["tools"] = tools
-            if "temperature" not in kwargs:
-                payload["temperature"] = 0
-
-        if self.enable_thinking:
-            payload["thinking"] = {"type": "enabled"}
-
-        response = self.session.post(
-            "https://open.bigmodel.cn/api/paas/v4/chat/completions",
-            json=payload,
-            timeout=kwargs.get("timeout", 120)
+        super().__init__(
+            api_key=api_key,
+            api_base="https://open.bigmodel.cn/api/paas/v4",
+            model=model or MODEL_CONFIG.get("model", ""),
+            **kwargs
         )
-        response.raise_for_status()
-        result = response.json()
-
-        if result.get("choices") and len(result["choices"]) > 0:
-            message = result["choices"][0].get("message", {})
-            thinking_content = message.get("reasoning_content", None)
-
-            if "tool_calls" in message:
-                return LLMResponse(
-                    content="",
-                    thinking=thinking_content,
-                    tool_calls=message["tool_calls"]
-                )
-
-            return LLMResponse(
-                content=message.get("content", ""),
-                thinking=thinking_content
-            )
-
-        return LLMResponse(content="")
-
-    def chat_stream(self, messages: List[Message], **kwargs) -> Iterator[str]:
-        payload = {
-            "model": self.model,
-            "messages": self._convert_messages(messages),
-            "temperature": kwargs.get("temperature", self.temperature),
-            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-            "stream": True,
-        }
+        # BigModel 默认不传 top_p
+        self.top_p = kwargs.get("top_p")
+        self.enable_thinking = kwargs.get("enable_thinking", MODEL_CONFIG.get("enable_thinking", True))
 
+    def _extra_payload(self, payload: Dict[str, Any]):
         if self.enable_thinking:
             payload["thinking"] = {"type": "enabled"}
 
-        response = self.session.post(
-            "https://open.bigmodel.cn/api/paas/v4/chat/completions",
-            json=payload,
-            stream=True,
-            timeout=kwargs.get("timeout", 120)
-        )
-        response.raise_for_status()
-
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    data = line[6:]
-                    if data != '[DONE]':
-                        chunk = json.loads(data)
-                        if chunk.get("choices"):
-                            content = chunk["choices"][0]["delta"].get("content", "")
-                            if content:
-                                yield content
-
-    def count_tokens(self, text: str) -> int:
-        chinese_chars = sum(1 for char in text if ord(char) > 127)
-        english_chars = len(text) - chinese_chars
-        return int(chinese_chars / 2 + english_chars / 4)
-
 
 class LLMFactory:
     """LLM引擎工厂"""
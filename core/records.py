@@ -0,0 +1,93 @@
+"""
+执行记录 - Agent引擎与会话管理共用的步骤记录类型
+Agent产生的步骤可直接存入会话，不再逐字段复制
+"""
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any
+
+
+def _tool_result_to_dict(result: Any) -> Dict[str, Any]:
+    """将工具结果渲染为存储用的字典（已是字典时原样返回）"""
+    if isinstance(result, dict):
+        return result
+    # 工具名只有少数几种，驻留后整个会话的所有结果共享同一个字符串对象
+    return {
+        "tool_name": sys.intern(result.tool_name),
+        "success": result.success,
+        "content": result.content,
+        "error": result.error
+    }
+
+
+@dataclass(slots=True)
+class SessionStep:
+    """
+    执行步骤
+
+    tool_results 在Agent执行时为 ToolResult 对象，从存储加载时为字典，
+    to_dict 统一渲染为字典。
+    """
+    step_number: int
+    timestamp: str
+    user_input: str
+    llm_response: str
+    tool_calls: List[Dict[str, Any]]
+    tool_results: List[Any]
+    is_completed: bool
+    final_message: Optional[str] = None
+    thinking: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return SessionStep.build(
+            step_number=self.step_number,
+            timestamp=self.timestamp,
+            user_input=self.user_input,
+            llm_response=self.llm_response,
+            tool_calls=self.tool_calls,
+            tool_results=[_tool_result_to_dict(result) for result in self.tool_results],
+            is_completed=self.is_completed,
+            final_message=self.final_message,
+            thinking=self.thinking
+        )
+
+    @staticmethod
+    def build(
+        step_number: int,
+        timestamp: str,
+        user_input: str,
+        llm_response: str,
+        tool_calls: List[Dict[str, Any]],
+        tool_results: List[Dict[str, Any]],
+        is_completed: bool,
+        final_message: Optional[str] = None,
+        thinking: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """直接构建用于存储的步骤字典，不经过dataclass实例"""
+        return {
+            "step_number": step_number,
+            "timestamp": timestamp,
+            "user_input": user_input,
+            "llm_response": llm_response,
+            "tool_calls": tool_calls,
+            "tool_results": tool_results,
+            "is_completed": is_completed,
+            "final_message": final_message,
+            "thinking": thinking
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SessionStep':
+        """从字典创建"""
+        return cls(
+            step_number=data["step_number"],
+            timestamp=data["timestamp"],
+            user_input=data["user_input"],
+            llm_response=data["llm_response"],
+            tool_calls=data.get("tool_calls", []),
+            tool_results=data.get("tool_results", []),
+            is_completed=data["is_completed"],
+            final_message=data.get("final_message"),
+            thinking=data.get("thinking")
+        )
@@ -2,65 +2,46 @@
 会话管理器 - 管理AI助手的上下文会话
 负责会话的创建、删除、查看、切换，以及会话记录的存储
 """
+import atexit
 import json
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union, Tuple, BinaryIO
 from dataclasses import dataclass, field, asdict
 from enum import Enum
 
+from core.records import SessionStep
 
-class SessionStatus(Enum):
-    """会话状态"""
-    ACTIVE = "active"
-    ARCHIVED = "archived"
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
-@dataclass
-class SessionStep:
-    """会话执行步骤"""
-    step_number: int
-    timestamp: str
-    user_input: str
-    llm_response: str
-    tool_calls: List[Dict[str, Any]]
-    tool_results: List[Dict[str, Any]]
-    is_completed: bool
-    final_message: Optional[str] = None
-    thinking: Optional[str] = None
+def _json_dumps(data: Any, indent: bool = False) -> bytes:
+    """序列化为UTF-8 JSON字节，优先使用orjson"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            # orjson不支持的值（如超过64位的整数）交给标准库处理
+            pass
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
 
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典"""
-        return {
-            "step_number": self.step_number,
-            "timestamp": self.timestamp,
-            "user_input": self.user_input,
-            "llm_response": self.llm_response,
-            "tool_calls": self.tool_calls,
-            "tool_results": self.tool_results,
-            "is_completed": self.is_completed,
-            "final_message": self.final_message,
-            "thinking": self.thinking
-        }
 
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'SessionStep':
-        """从字典创建"""
-        return cls(
-            step_number=data["step_number"],
-            timestamp=data["timestamp"],
-            user_input=data["user_input"],
-            llm_response=data["llm_response"],
-            tool_calls=data.get("tool_calls", []),
-            tool_results=data.get("tool_results", []),
-            is_completed=data["is_completed"],
-            final_message=data.get("final_message"),
-            thinking=data.get("thinking")
-        )
+_json_loads = orjson.loads if orjson is not None else json.loads
+
 
+class SessionStatus(Enum):
+    """会话状态"""
+    ACTIVE = "active"
+    ARCHIVED = "archived"
 
-@dataclass
+
+@dataclass(slots=True)
 class SessionRecord:
     """会话记录"""
     session_id: str
@@ -98,7 +79,23 @@ class SessionRecord:
 
 
 class SessionManager:
-    """会话管理器"""
+    """
+    会话管理器
+
+    每次修改以操作记录的形式追加到 sessions.log.jsonl（短时间内的多次修改合并写入），
+    sessions.json 是定期合并的快照。
+    加载时先读快照再重放日志；快照记录已合并的日志序号，重复重放时会跳过。
+    """
+
+    # 日志累积多少条操作后合并为快照
+    COMPACT_EVERY = 50
+    # 两次写入日志文件的最小间隔（秒），期间的操作合并为一次写入
+    FLUSH_INTERVAL = 0.5
+    # 会话摘要中原样保留的最近问题数（RECENT_QUESTIONS 到 2*RECENT_QUESTIONS-1 个），
+    # 更早的问题每凑满 RECENT_QUESTIONS 个才整体折叠进滚动摘要
+    RECENT_QUESTIONS = 5
+    # 滚动摘要中单个问题/结果保留的最大字符数
+    ROLLING_ITEM_CHARS = 60
 
     def __init__(self, storage_dir: str = None):
         """
@@ -112,53 +109,258 @@ class SessionManager:
 
         self.storage_dir = storage_dir
         self.sessions_file = os.path.join(self.storage_dir, "sessions.json")
+        self.log_file = os.path.join(self.storage_dir, "sessions.log.jsonl")
         self._ensure_storage_dir()
         self._sessions: Dict[str, SessionRecord] = {}
         self._current_session_id: Optional[str] = None
+        self._log_seq = 0
+        self._pending_ops = 0
+        # 尚未写入日志文件的操作，合并后按 FLUSH_INTERVAL 批量写入
+        self._pending_log: List[bytes] = []
+        self._last_flush = 0.0
+        self._flush_timer: Optional[threading.Timer] = None
+        self._io_lock = threading.RLock()
+        # 日志文件以追加模式保持打开，每次写入不再重新打开文件
+        self._log_handle: Optional[BinaryIO] = None
+        # 当前会话所有步骤的顺序索引 [(问题, 步骤字典)]，切换会话后首次查询时重建
+        self._step_index: List[Tuple[str, Dict[str, Any]]] = []
+        self._step_index_session: Optional[str] = None
+        # 每次应用操作时递增，用于判断缓存的会话摘要是否过期
+        self._version = 0
+        # 会话ID -> (生成时的版本号, 会话摘要)
+        self._summary_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
 
         self._load_sessions()
+        atexit.register(self.close)
 
     def _ensure_storage_dir(self):
         """确保存储目录存在"""
         os.makedirs(self.storage_dir, exist_ok=True)
 
     def _load_sessions(self):
-        """加载会话数据"""
+        """加载会话数据（快照 + 日志重放）"""
+        self._sessions = {}
+        self._current_session_id = None
+        self._log_seq = 0
+        self._step_index_session = None
+
         if os.path.exists(self.sessions_file):
             try:
-                with open(self.sessions_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with open(self.sessions_file, 'rb') as f:
+                    data = _json_loads(f.read())
                     if "sessions" in data:
                         self._sessions = {
                             sid: SessionRecord.from_dict(sdata)
                             for sid, sdata in data.get("sessions", {}).items()
                         }
                         self._current_session_id = data.get("current_session_id")
+                        self._log_seq = data.get("log_seq", 0)
                     else:
                         self._sessions = {
                             sid: SessionRecord.from_dict(sdata)
                             for sid, sdata in data.items()
                         }
-                        self._current_session_id = None
             except (json.JSONDecodeError, KeyError) as e:
                 print(f"警告: 加载会话数据失败: {e}")
                 self._sessions = {}
                 self._current_session_id = None
+                self._log_seq = 0
+
+        self._replay_log()
+
+        # 会话按创建顺序插入，list_sessions 直接倒序遍历；导入的旧数据顺序不对时排序一次
+        created = [session.created_at for session in self._sessions.values()]
+        if any(a > b for a, b in zip(created, created[1:])):
+            self._sessions = dict(sorted(self._sessions.items(), key=lambda item: item[1].created_at))
+
+        # 旧数据中可能有多个激活的会话，加载时统一为只有当前会话激活
+        if self._current_session_id in self._sessions:
+            for sid, session in self._sessions.items():
+                if sid != self._current_session_id and session.status == SessionStatus.ACTIVE.value:
+                    session.status = SessionStatus.ARCHIVED.value
         else:
-            self._sessions = {}
             self._current_session_id = None
 
-    def _save_sessions(self):
-        """保存会话数据"""
-        data = {
-            "sessions": {
-                sid: session.to_dict()
-                for sid, session in self._sessions.items()
-            },
-            "current_session_id": self._current_session_id
-        }
-        with open(self.sessions_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def _replay_log(self):
+        """
+        重放快照之后的操作日志
+
+        最后一行可能在写入时中断：截断到最后一个完整行，之后追加的操作不会接在残缺的字节后面。
+        """
+        if not os.path.exists(self.log_file):
+            return
+
+        good_end = 0
+        torn = False
+        with open(self.log_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    torn = True
+                    break
+                try:
+                    op = _json_loads(line)
+                except json.JSONDecodeError:
+                    torn = True
+                    break
+                good_end += len(line)
+                seq = op.get("seq", 0)
+                if seq <= self._log_seq:
+                    continue
+                try:
+                    self._apply(op)
+                except KeyError:
+                    pass
+                self._log_seq = seq
+                self._pending_ops += 1
+
+        if torn:
+            with open(self.log_file, 'r+b') as f:
+                f.truncate(good_end)
+
+    def _apply(self, op: Dict[str, Any]):
+        """将一条操作应用到内存中的会话数据"""
+        self._version += 1
+        kind = op["op"]
+        sid = op.get("sid")
+
+        if kind == "create":
+            session = SessionRecord.from_dict(op["session"])
+            self._sessions[session.session_id] = session
+            self._set_current(session.session_id)
+
+        elif kind == "delete":
+            self._sessions.pop(sid, None)
+            self._summary_cache.pop(sid, None)
+            if self._step_index_session == sid:
+                self._step_index_session = None
+            if self._current_session_id == sid:
+                self._current_session_id = None
+
+        elif kind in ("switch", "activate"):
+            self._set_current(sid)
+            self._sessions[sid].updated_at = op["updated_at"]
+
+        elif kind == "archive":
+            self._sessions[sid].status = SessionStatus.ARCHIVED.value
+            self._sessions[sid].updated_at = op["updated_at"]
+            if self._current_session_id == sid:
+                self._current_session_id = None
+
+        elif kind == "restore":
+            self._set_current(sid)
+
+        elif kind == "add_question":
+            session = self._sessions[sid]
+            question_record = op["question"]
+            session.questions.append(question_record)
+            if sid == self._step_index_session:
+                question = question_record["question"]
+                self._step_index.extend((question, step) for step in question_record.get("steps", []))
+            if question_record.get("summary"):
+                session.summary = question_record["summary"]
+            session.updated_at = op["updated_at"]
+
+    @staticmethod
+    def _now_str(now: Optional[datetime] = None) -> str:
+        """格式化时间为 YYYY-MM-DD HH:MM:SS（isoformat不需要解析格式串，比strftime快）"""
+        if now is None:
+            now = datetime.now()
+        return now.isoformat(sep=" ", timespec="seconds")
+
+    def _set_current(self, session_id: str):
+        """
+        设置当前会话
+
+        只有当前会话处于激活状态，切换时只需归档上一个当前会话，不必遍历所有会话。
+        """
+        previous = self._sessions.get(self._current_session_id) if self._current_session_id else None
+        if previous is not None and previous.session_id != session_id:
+            previous.status = SessionStatus.ARCHIVED.value
+        self._sessions[session_id].status = SessionStatus.ACTIVE.value
+        self._current_session_id = session_id
+
+    def _commit(self, op: Dict[str, Any]):
+        """应用操作并放入日志缓冲区，累积到一定数量后合并快照"""
+        self._apply(op)
+        self._log_seq += 1
+        op["seq"] = self._log_seq
+        line = _json_dumps(op) + b"\n"
+        with self._io_lock:
+            self._pending_log.append(line)
+        self._pending_ops += 1
+        if self._pending_ops >= self.COMPACT_EVERY:
+            self.compact()
+        else:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """距上次写入超过 FLUSH_INTERVAL 时立即写入，否则安排一次延迟写入"""
+        with self._io_lock:
+            elapsed = time.monotonic() - self._last_flush
+            if elapsed < self.FLUSH_INTERVAL:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.FLUSH_INTERVAL - elapsed, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        """将缓冲的操作追加写入日志文件"""
+        with self._io_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending_log:
+                return
+            data = b"".join(self._pending_log)
+            self._pending_log.clear()
+            handle = self._open_log()
+            handle.write(data)
+            handle.flush()
+            self._last_flush = time.monotonic()
+
+    def _open_log(self) -> BinaryIO:
+        """获取日志文件句柄（调用方需持有 _io_lock）"""
+        handle = self._log_handle
+        if handle is None or handle.closed:
+            handle = self._log_handle = open(self.log_file, 'ab')
+        return handle
+
+    def close(self):
+        """合并快照并关闭日志文件（进程退出时自动调用）"""
+        with self._io_lock:
+            self.compact()
+            if self._log_handle is not None:
+                self._log_handle.close()
+                self._log_handle = None
+
+    def compact(self):
+        """将当前数据写成快照（先写临时文件再替换），并清空日志"""
+        with self._io_lock:
+            if self._pending_ops == 0 and os.path.exists(self.sessions_file):
+                return
+
+            data = {
+                "sessions": {
+                    sid: session.to_dict()
+                    for sid, session in self._sessions.items()
+                },
+                "current_session_id": self._current_session_id,
+                "log_seq": self._log_seq
+            }
+            tmp_file = f"{self.sessions_file}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(_json_dumps(data, indent=True))
+            os.replace(tmp_file, self.sessions_file)
+
+            # 快照已包含全部日志（包括尚未写入的缓冲）；若清空前中断，重放时按序号跳过
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._pending_log.clear()
+            self._open_log().truncate(0)
+            self._pending_ops = 0
 
     def create_session(self) -> str:
         """
@@ -168,13 +370,10 @@ class SessionManager:
             session_id: 新会话的ID
         """
         session_id = str(uuid.uuid4())[:8]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = self._now_str()
 
         workdir = os.getcwd()
 
-        for sid in self._sessions:
-            self._sessions[sid].status = SessionStatus.ARCHIVED.value
-
         session = SessionRecord(
             session_id=session_id,
             status=SessionStatus.ACTIVE.value,
@@ -183,9 +382,7 @@ class SessionManager:
             workdir=workdir
         )
 
-        self._sessions[session_id] = session
-        self._current_session_id = session_id
-        self._save_sessions()
+        self._commit({"op": "create", "session": session.to_dict()})
 
         return session_id
 
@@ -202,12 +399,7 @@ class SessionManager:
         if session_id not in self._sessions:
             return False
 
-        del self._sessions[session_id]
-
-        if self._current_session_id == session_id:
-            self._current_session_id = None
-
-        self._save_sessions()
+        self._commit({"op": "delete", "sid": session_id})
         return True
 
     def get_session(self, session_id: str) -> Optional[SessionRecord]:
@@ -243,12 +435,15 @@ class SessionManager:
         Returns:
             List[SessionRecord]: 会话列表
         """
-        sessions = list(self._sessions.values())
+        if status == SessionStatus.ACTIVE and self._current_session_id:
+            # 存在当前会话时，它是唯一激活的会话
+            return [self._sessions[self._current_session_id]]
 
+        # 字典保持创建顺序，倒序即按创建时间从新到旧
         if status:
-            sessions = [s for s in sessions if s.status == status.value]
+            return [s for s in reversed(self._sessions.values()) if s.status == status.value]
 
-        return sorted(sessions, key=lambda x: x.created_at, reverse=True)
+        return list(reversed(self._sessions.values()))
 
     def switch_session(self, session_id: str) -> bool:
         """
@@ -263,14 +458,11 @@ class SessionManager:
         if session_id not in self._sessions:
             return False
 
-        for sid in self._sessions:
-            if sid != session_id:
-                self._sessions[sid].status = SessionStatus.ARCHIVED.value
-
-        self._current_session_id = session_id
-        self._sessions[session_id].status = SessionStatus.ACTIVE.value
-        self._sessions[session_id].updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self._save_sessions()
+        self._commit({
+            "op": "switch",
+            "sid": session_id,
+            "updated_at": self._now_str()
+        })
         return True
 
     def archive_session(self, session_id: str) -> bool:
@@ -286,13 +478,11 @@ class SessionManager:
         if session_id not in self._sessions:
             return False
 
-        self._sessions[session_id].status = SessionStatus.ARCHIVED.value
-        self._sessions[session_id].updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        if self._current_session_id == session_id:
-            self._current_session_id = None
-
-        self._save_sessions()
+        self._commit({
+            "op": "archive",
+            "sid": session_id,
+            "updated_at": self._now_str()
+        })
         return True
 
     def activate_session(self, session_id: str) -> bool:
@@ -308,17 +498,18 @@ class SessionManager:
         if session_id not in self._sessions:
             return False
 
-        self._sessions[session_id].status = SessionStatus.ACTIVE.value
-        self._sessions[session_id].updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self._current_session_id = session_id
-        self._save_sessions()
+        self._commit({
+            "op": "activate",
+            "sid": session_id,
+            "updated_at": self._now_str()
+        })
         return True
 
     def add_question(
         self,
         session_id: str,
         question: str,
-        steps: List[SessionStep],
+        steps: List[Union[SessionStep, Dict[str, Any]]],
         summary: str = None
     ) -> bool:
         """
@@ -327,7 +518,7 @@ class SessionManager:
         Args:
             session_id: 会话ID
             question: 用户问题
-            steps: 执行步骤
+            steps: 执行步骤（SessionStep 或 SessionStep.build 构建的字典）
             summary: 总结
 
         Returns:
@@ -336,20 +527,20 @@ class SessionManager:
         if session_id not in self._sessions:
             return False
 
+        now = datetime.now()
         question_record = {
             "question": question,
-            "timestamp": datetime.now().isoformat(),
-            "steps": [step.to_dict() for step in steps],
+            "timestamp": now.isoformat(),
+            "steps": [step if isinstance(step, dict) else step.to_dict() for step in steps],
             "summary": summary
         }
 
-        self._sessions[session_id].questions.append(question_record)
-
-        if summary:
-            self._sessions[session_id].summary = summary
-
-        self._sessions[session_id].updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self._save_sessions()
+        self._commit({
+            "op": "add_question",
+            "sid": session_id,
+            "question": question_record,
+            "updated_at": self._now_str(now)
+        })
         return True
 
     def get_session_details(self, session_id: str) -> Optional[Dict[str, Any]]:
@@ -394,9 +585,7 @@ class SessionManager:
 
         active_sessions = self.list_sessions(SessionStatus.ACTIVE)
         if active_sessions:
-            self._current_session_id = active_sessions[0].session_id
-            self._sessions[self._current_session_id].status = SessionStatus.ACTIVE.value
-            self._save_sessions()
+            self._commit({"op": "restore", "sid": active_sessions[0].session_id})
             return self._current_session_id
 
         return self.create_session()
@@ -415,6 +604,9 @@ class SessionManager:
         """
         获取会话摘要（默认返回当前激活会话）
 
+        摘要按会话缓存，任何会话操作都会使缓存失效。返回的是缓存的浅拷贝，
+        其中的列表与缓存共享，调用方不应修改。
+
         Args:
             session_id: 会话ID，不指定则返回当前会话
 
@@ -424,6 +616,17 @@ class SessionManager:
         if session_id is None:
             session_id = self._current_session_id
 
+        cached = self._summary_cache.get(session_id)
+        if cached is not None and cached[0] == self._version:
+            return dict(cached[1])
+
+        summary = self._build_session_summary(session_id)
+        if summary["session_id"] is not None:
+            self._summary_cache[session_id] = (self._version, summary)
+        return dict(summary)
+
+    def _build_session_summary(self, session_id: Optional[str]) -> Dict[str, Any]:
+        """生成会话摘要"""
         if session_id and session_id in self._sessions:
             session = self._sessions[session_id]
             question_summaries = []
@@ -436,6 +639,10 @@ class SessionManager:
                     "steps_count": len(q.get("steps", []))
                 })
 
+            # 按整块折叠：两次折叠之间生成的会话上下文只在末尾追加新问题，
+            # 前缀保持逐字节不变，服务端的前缀缓存可以继续命中
+            recent = self.RECENT_QUESTIONS
+            split = max(len(question_summaries) - recent, 0) // recent * recent
             return {
                 "session_id": session.session_id,
                 "status": session.status,
@@ -443,6 +650,10 @@ class SessionManager:
                 "updated_at": session.updated_at,
                 "questions_count": len(session.questions),
                 "question_summaries": question_summaries,
+                "recent": question_summaries[split:],
+                "rolling_summary": "；".join(
+                    self._fold_question(qs) for qs in question_summaries[:split]
+                ),
                 "is_current": session_id == self._current_session_id
             }
 
@@ -451,9 +662,47 @@ class SessionManager:
             "status": None,
             "questions_count": 0,
             "question_summaries": [],
+            "recent": [],
+            "rolling_summary": "",
             "message": "没有活动的会话"
         }
 
+    @classmethod
+    def _fold_question(cls, qs: Dict[str, Any]) -> str:
+        """将较早的问题压缩为滚动摘要中的一项：[序号] 问题 -> 结果（均截断）"""
+        limit = cls.ROLLING_ITEM_CHARS
+        question = " ".join(qs["question"].split())
+        if len(question) > limit:
+            question = question[:limit] + "…"
+        item = f"[{qs['index']}] {question}"
+        result = " ".join((qs["summary"] or "").split())
+        if result:
+            if len(result) > limit:
+                result = result[:limit] + "…"
+            item += f" -> {result}"
+        return item
+
+    def _get_step_index(self, session_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """获取会话的步骤索引（按需重建，之后随 add_question 增量更新）"""
+        if self._step_index_session != session_id:
+            self._step_index = [
+                (q["question"], step)
+                for q in self._sessions[session_id].questions
+                for step in q.get("steps", [])
+            ]
+            self._step_index_session = session_id
+        return self._step_index
+
+    @staticmethod
+    def _format_result_line(tool_call: Dict[str, Any], result: Optional[Dict[str, Any]]) -> str:
+        """格式化单个工具调用的结果摘要行"""
+        function = tool_call.get("function")
+        tool_name = function.get("name") if function and "name" in function else tool_call.get("name", "unknown")
+        if not result:
+            return f"- {tool_name}: (无结果)"
+        content = result["content"] if "content" in result else result.get("message", "")
+        return f"- {tool_name}: {content}"
+
     def get_step_detail(self, step_number: int) -> Dict[str, Any]:
         """
         获取指定步骤的详细信息
@@ -468,44 +717,31 @@ class SessionManager:
         if not current_session or current_session not in self._sessions:
             return {"error": "没有活动的会话"}
 
-        session = self._sessions[current_session]
-
-        all_steps = []
-        for q in session.questions:
-            steps = q.get("steps", [])
-            for step in steps:
-                all_steps.append({
-                    "question": q["question"],
-                    "step": step
-                })
+        all_steps = self._get_step_index(current_session)
 
         if step_number < 0 or step_number >= len(all_steps):
             return {"error": f"步骤 {step_number} 不存在，有效范围 0-{len(all_steps)-1}"}
 
-        item = all_steps[step_number]
-        step_data = item["step"]
+        question, step_data = all_steps[step_number]
 
         tool_calls = step_data.get("tool_calls", [])
         tool_results = step_data.get("tool_results", [])
 
-        result_info = []
-        for i, tc in enumerate(tool_calls):
-            tool_name = tc.get("function", {}).get("name", tc.get("name", "unknown"))
-            result = tool_results[i] if i < len(tool_results) else None
-            if result:
-                result_info.append(f"- {tool_name}: {result.get('content', result.get('message', ''))}")
-            else:
-                result_info.append(f"- {tool_name}: (无结果)")
+        results_count = len(tool_results)
+        result_summary = "\n".join(
+            self._format_result_line(tc, tool_results[i] if i < results_count else None)
+            for i, tc in enumerate(tool_calls)
+        ) or None
 
         return {
             "step_number": step_number,
-            "question": item["question"],
+            "question": question,
             "timestamp": step_data["timestamp"],
             "is_completed": step_data["is_completed"],
             "final_message": step_data.get("final_message"),
             "tool_calls_count": len(tool_calls),
             "tool_calls": tool_calls,
             "tool_results": tool_results,
-            "result_summary": "\n".join(result_info) if result_info else None
+            "result_summary": result_summary
         }
 
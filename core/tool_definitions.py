@@ -2,23 +2,24 @@
 工具定义层 - 将所有命令转换为标准化Tool Calling格式
 支持OpenAI、Qwen、Claude等主流LLM的Tool Calling规范
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Final, Literal, Tuple
 from dataclasses import dataclass, field
-from enum import Enum
+from functools import lru_cache
 import json
 
 
-class ParameterType(Enum):
-    """参数类型枚举"""
-    STRING = "string"
-    INTEGER = "integer"
-    NUMBER = "number"
-    BOOLEAN = "boolean"
-    ARRAY = "array"
-    OBJECT = "object"
+# 参数类型（JSON Schema类型字符串）
+ParameterType = Literal["string", "integer", "number", "boolean", "array", "object"]
 
+STRING: Final[ParameterType] = "string"
+INTEGER: Final[ParameterType] = "integer"
+NUMBER: Final[ParameterType] = "number"
+BOOLEAN: Final[ParameterType] = "boolean"
+ARRAY: Final[ParameterType] = "array"
+OBJECT: Final[ParameterType] = "object"
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class ToolParameter:
     """工具参数定义"""
     name: str
@@ -29,12 +30,39 @@ class ToolParameter:
     properties: Optional[Dict[str, Any]] = None
 
 
-@dataclass
+# 参数schema字典的共享缓存：形状相同的参数复用同一个字典（视为只读）
+_PARAM_DICT_CACHE: Dict[tuple, Dict[str, Any]] = {}
+
+
+def _intern_param_dict(param: ToolParameter) -> Dict[str, Any]:
+    """返回参数对应的schema字典，相同的类型、描述、枚举和子属性共享同一实例"""
+    key = (
+        param.type,
+        param.description,
+        tuple(param.enum) if param.enum else None,
+        json.dumps(param.properties, sort_keys=True, ensure_ascii=False) if param.properties else None,
+    )
+    param_dict = _PARAM_DICT_CACHE.get(key)
+    if param_dict is None:
+        param_dict = _PARAM_DICT_CACHE[key] = {
+            "type": param.type,
+            "description": param.description,
+            **({"enum": param.enum} if param.enum else {}),
+            **({"properties": param.properties} if param.properties else {}),
+        }
+    return param_dict
+
+
+@dataclass(slots=True, frozen=True, eq=False)
 class ToolDefinition:
-    """工具定义 - 符合OpenAI Function Calling规范"""
+    """工具定义 - 符合OpenAI Function Calling规范（创建后不可修改，按对象身份比较和哈希）"""
     name: str
     description: str
     parameters: Dict[str, Any]
+    # 各格式的转换结果在首次转换时缓存（实例不可变，通过 object.__setattr__ 写入）
+    _openai_format: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+    _anthropic_format: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+    _openai_json: Optional[str] = field(default=None, init=False, repr=False, compare=False)
     
     @classmethod
     def create(
@@ -45,19 +73,9 @@ class ToolDefinition:
         required_params: Optional[List[str]] = None
     ) -> "ToolDefinition":
         """创建工具定义"""
-        properties = {}
-        for param in parameters:
-            param_dict = {
-                "type": param.type.value,
-                "description": param.description
-            }
-            if param.enum:
-                param_dict["enum"] = param.enum
-            if param.properties:
-                param_dict["properties"] = param.properties
-            properties[param.name] = param_dict
-        
-        required = required_params or [p.name for p in parameters if p.required]
+        properties = {p.name: _intern_param_dict(p) for p in parameters}
+        # 定义创建后不再修改，required 直接存为元组（序列化结果与列表相同）
+        required = tuple(required_params) if required_params else tuple(p.name for p in parameters if p.required)
         
         return cls(
             name=name,
@@ -70,51 +88,75 @@ class ToolDefinition:
         )
     
     def to_openai_format(self) -> Dict[str, Any]:
-        """转换为OpenAI函数调用格式"""
-        return {
-            "type": "function",
-            "function": {
-                "name": self.name,
-                "description": self.description,
-                "parameters": self.parameters
-            }
-        }
+        """转换为OpenAI函数调用格式（返回缓存的字典，调用方不应修改）"""
+        if self._openai_format is None:
+            object.__setattr__(self, "_openai_format", {
+                "type": "function",
+                "function": {
+                    "name": self.name,
+                    "description": self.description,
+                    "parameters": self.parameters
+                }
+            })
+        return self._openai_format
     
+    def to_openai_json(self) -> str:
+        """OpenAI格式的紧凑JSON字符串（首次调用时序列化并缓存）"""
+        if self._openai_json is None:
+            object.__setattr__(self, "_openai_json", json.dumps(
+                self.to_openai_format(), ensure_ascii=False, separators=(",", ":")
+            ))
+        return self._openai_json
+
     def to_qwen_format(self) -> Dict[str, Any]:
-        """转换为Qwen工具调用格式"""
-        return {
-            "type": "function",
-            "function": {
-                "name": self.name,
-                "description": self.description,
-                "parameters": self.parameters
-            }
-        }
+        """转换为Qwen工具调用格式（与OpenAI格式相同）"""
+        return self.to_openai_format()
     
     def to_anthropic_format(self) -> Dict[str, Any]:
-        """转换为Claude工具调用格式"""
-        return {
-            "name": self.name,
-            "description": self.description,
-            "input_schema": self.parameters
-        }
+        """转换为Claude工具调用格式（返回缓存的字典，调用方不应修改）"""
+        if self._anthropic_format is None:
+            # 与OpenAI格式只差键名，直接引用其function字典中的值
+            function = self.to_openai_format()["function"]
+            object.__setattr__(self, "_anthropic_format", {
+                "name": function["name"],
+                "description": function["description"],
+                "input_schema": function["parameters"]
+            })
+        return self._anthropic_format
 
+    def to_summary(self) -> Dict[str, Any]:
+        """只含名称和描述的精简定义（不含参数schema）"""
+        return {"name": self.name, "description": self.description}
+
+
+def get_all_tool_definitions() -> Tuple[ToolDefinition, ...]:
+    """获取所有工具定义（共享的只读元组）"""
+    return _ALL_TOOLS
 
-def get_all_tool_definitions() -> List[ToolDefinition]:
-    """获取所有工具定义"""
-    return [
-        TOOL_READ,
-        TOOL_WRITE,
-        TOOL_EDIT,
-        TOOL_GLOB,
-        TOOL_GREP,
-        TOOL_BASH,
-        TOOL_TODOWRITE,
-        TOOL_QUESTION,
-        TOOL_WEBFETCH,
-        TOOL_SKILL,
-        TOOL_SESSION_DETAIL,
-    ]
+
+# 数组参数的元素schema，模块级常量供工具定义直接引用
+_TODO_ITEMS_SCHEMA: Dict[str, Any] = {
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "string", "description": "任务唯一标识"},
+            "content": {"type": "string", "description": "任务描述"},
+            "status": {"type": "string", "enum": ["pending", "in_progress", "completed", "cancelled"], "description": "任务状态"},
+            "priority": {"type": "string", "enum": ["high", "medium", "low"], "description": "优先级"}
+        }
+    }
+}
+
+_QUESTION_ITEMS_SCHEMA: Dict[str, Any] = {
+    "items": {
+        "type": "object",
+        "properties": {
+            "question": {"type": "string", "description": "完整问题描述"},
+            "header": {"type": "string", "description": "简短标签（最多30字符）"},
+            "options": {"type": "array", "description": "可选答案列表"}
+        }
+    }
+}
 
 
 TOOL_READ = ToolDefinition.create(
@@ -123,19 +165,19 @@ TOOL_READ = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="filePath",
-            type=ParameterType.STRING,
+            type=STRING,
             description="要读取的文件路径（绝对路径或相对于工作目录）",
             required=True
         ),
         ToolParameter(
             name="limit",
-            type=ParameterType.INTEGER,
+            type=INTEGER,
             description="限制读取的行数，默认2000行",
             required=False
         ),
         ToolParameter(
             name="offset",
-            type=ParameterType.INTEGER,
+            type=INTEGER,
             description="从指定行号开始读取（0-based），默认0",
             required=False
         )
@@ -148,13 +190,13 @@ TOOL_WRITE = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="filePath",
-            type=ParameterType.STRING,
+            type=STRING,
             description="要创建/写入的文件路径",
             required=True
         ),
         ToolParameter(
             name="content",
-            type=ParameterType.STRING,
+            type=STRING,
             description="文件内容",
             required=True
         )
@@ -167,25 +209,25 @@ TOOL_EDIT = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="filePath",
-            type=ParameterType.STRING,
+            type=STRING,
             description="要编辑的文件路径",
             required=True
         ),
         ToolParameter(
             name="oldString",
-            type=ParameterType.STRING,
+            type=STRING,
             description="要替换的旧文本（必须精确匹配）",
             required=True
         ),
         ToolParameter(
             name="newString",
-            type=ParameterType.STRING,
+            type=STRING,
             description="替换后的新文本",
             required=True
         ),
         ToolParameter(
             name="replaceAll",
-            type=ParameterType.BOOLEAN,
+            type=BOOLEAN,
             description="是否替换所有匹配项（默认False）",
             required=False
         )
@@ -198,13 +240,13 @@ TOOL_GLOB = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="pattern",
-            type=ParameterType.STRING,
+            type=STRING,
             description="文件通配符模式，如 **/*.py、*.txt、src/**/*.js 等",
             required=True
         ),
         ToolParameter(
             name="path",
-            type=ParameterType.STRING,
+            type=STRING,
             description="搜索路径，默认为当前工作目录",
             required=False
         )
@@ -217,19 +259,19 @@ TOOL_GREP = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="pattern",
-            type=ParameterType.STRING,
+            type=STRING,
             description="正则表达式搜索模式",
             required=True
         ),
         ToolParameter(
             name="path",
-            type=ParameterType.STRING,
+            type=STRING,
             description="搜索路径，默认为当前工作目录",
             required=False
         ),
         ToolParameter(
             name="include",
-            type=ParameterType.STRING,
+            type=STRING,
             description="文件类型过滤，如 *.py、*.{ts,tsx}",
             required=False
         )
@@ -242,19 +284,19 @@ TOOL_BASH = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="command",
-            type=ParameterType.STRING,
+            type=STRING,
             description="要执行的命令",
             required=True
         ),
         ToolParameter(
             name="timeout",
-            type=ParameterType.INTEGER,
+            type=INTEGER,
             description="超时时间（毫秒），默认120000（2分钟）",
             required=False
         ),
         ToolParameter(
             name="workdir",
-            type=ParameterType.STRING,
+            type=STRING,
             description="执行命令的工作目录",
             required=False
         )
@@ -267,20 +309,10 @@ TOOL_TODOWRITE = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="todos",
-            type=ParameterType.ARRAY,
+            type=ARRAY,
             description="任务列表，每个任务包含id、content、status、priority",
             required=True,
-            properties={
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "id": {"type": "string", "description": "任务唯一标识"},
-                        "content": {"type": "string", "description": "任务描述"},
-                        "status": {"type": "string", "enum": ["pending", "in_progress", "completed", "cancelled"], "description": "任务状态"},
-                        "priority": {"type": "string", "enum": ["high", "medium", "low"], "description": "优先级"}
-                    }
-                }
-            }
+            properties=_TODO_ITEMS_SCHEMA
         )
     ]
 )
@@ -292,19 +324,10 @@ TOOL_QUESTION = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="questions",
-            type=ParameterType.ARRAY,
+            type=ARRAY,
             description="问题列表，每个问题包含question、header、options",
             required=True,
-            properties={
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "question": {"type": "string", "description": "完整问题描述"},
-                        "header": {"type": "string", "description": "简短标签（最多30字符）"},
-                        "options": {"type": "array", "description": "可选答案列表"}
-                    }
-                }
-            }
+            properties=_QUESTION_ITEMS_SCHEMA
         )
     ]
 )
@@ -315,13 +338,13 @@ TOOL_WEBFETCH = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="url",
-            type=ParameterType.STRING,
+            type=STRING,
             description="要获取的网页URL",
             required=True
         ),
         ToolParameter(
             name="format",
-            type=ParameterType.STRING,
+            type=STRING,
             description="返回格式：text、markdown或html，默认markdown",
             required=False,
             enum=["text", "markdown", "html"]
@@ -335,7 +358,7 @@ TOOL_SKILL = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="name",
-            type=ParameterType.STRING,
+            type=STRING,
             description="技能标识符，如 code-review",
             required=True
         )
@@ -348,7 +371,7 @@ TOOL_SESSION_DETAIL = ToolDefinition.create(
     parameters=[
         ToolParameter(
             name="stepNumber",
-            type=ParameterType.INTEGER,
+            type=INTEGER,
             description="步骤编号（从0开始），指定要查看的步骤",
             required=True
         )
@@ -356,46 +379,129 @@ TOOL_SESSION_DETAIL = ToolDefinition.create(
 )
 
 
+_ALL_TOOLS: Tuple[ToolDefinition, ...] = (
+    TOOL_READ,
+    TOOL_WRITE,
+    TOOL_EDIT,
+    TOOL_GLOB,
+    TOOL_GREP,
+    TOOL_BASH,
+    TOOL_TODOWRITE,
+    TOOL_QUESTION,
+    TOOL_WEBFETCH,
+    TOOL_SKILL,
+    TOOL_SESSION_DETAIL,
+)
+
+_TOOLS_BY_NAME: Dict[str, ToolDefinition] = {tool.name: tool for tool in _ALL_TOOLS}
+
+# 内置工具集固定，导入时预先生成各格式的定义
+for _tool in _ALL_TOOLS:
+    _tool.to_openai_format()
+    _tool.to_anthropic_format()
+del _tool
+
+
+def to_openai(tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
+    """转换为OpenAI格式"""
+    return [tool.to_openai_format() for tool in tools]
+
+
+def to_qwen(tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
+    """转换为Qwen格式（与OpenAI兼容）"""
+    return to_openai(tools)
+
+
+def to_anthropic(tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
+    """转换为Claude/Anthropic格式"""
+    return [tool.to_anthropic_format() for tool in tools]
+
+
+def to_ollama(tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
+    """转换为Ollama格式（与OpenAI兼容）"""
+    return to_openai(tools)
+
+
 class ToolCallingFormatter:
-    """Tool Calling格式转换器 - 适配不同LLM提供商"""
+    """Tool Calling格式转换器 - 适配不同LLM提供商（格式转换委托给模块级函数）"""
     
     @staticmethod
     def to_openai(tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
         """转换为OpenAI格式"""
-        return [tool.to_openai_format() for tool in tools]
+        return to_openai(tools)
     
     @staticmethod
     def to_qwen(tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
-        """转换为Qwen格式"""
-        return [tool.to_qwen_format() for tool in tools]
+        """转换为Qwen格式（与OpenAI兼容）"""
+        return to_openai(tools)
     
     @staticmethod
     def to_anthropic(tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
         """转换为Claude/Anthropic格式"""
-        return [tool.to_anthropic_format() for tool in tools]
+        return to_anthropic(tools)
     
     @staticmethod
     def to_ollama(tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
         """转换为Ollama格式（与OpenAI兼容）"""
-        return ToolCallingFormatter.to_openai(tools)
+        return to_openai(tools)
     
+    @staticmethod
+    def to_openai_summaries(tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
+        """转换为只含名称和描述的OpenAI格式，参数schema按需通过promote获取"""
+        return [{"type": "function", "function": tool.to_summary()} for tool in tools]
+
+    @staticmethod
+    def to_openai_json(tools: Optional[List[ToolDefinition]] = None) -> str:
+        """OpenAI格式工具列表的紧凑JSON，由各工具缓存的序列化结果拼接；默认工具集直接返回导入时的结果"""
+        if tools is None:
+            return _OPENAI_JSON
+        return "[" + ",".join(tool.to_openai_json() for tool in tools) + "]"
+
+    @staticmethod
+    def promote(tool_names) -> List[Dict[str, Any]]:
+        """返回指定工具的完整OpenAI格式定义，未知名称忽略"""
+        return [_SCHEMA_REGISTRY[name] for name in tool_names if name in _SCHEMA_REGISTRY]
+
     @staticmethod
     def format_for_engine(engine_type: str, tools: List[ToolDefinition]) -> List[Dict[str, Any]]:
-        """根据引擎类型自动选择格式"""
-        formatters = {
-            "openai": ToolCallingFormatter.to_openai,
-            "anthropic": ToolCallingFormatter.to_anthropic,
-            "ollama": ToolCallingFormatter.to_ollama,
-            "qwen": ToolCallingFormatter.to_qwen,
-            "deepseek": ToolCallingFormatter.to_openai,
-        }
-        formatter = formatters.get(engine_type.lower(), ToolCallingFormatter.to_openai)
-        return formatter(tools)
+        """根据引擎类型自动选择格式（默认工具集直接返回预先生成的列表，调用方不应修改）"""
+        engine_type = engine_type.lower()
+        if tools is not _ALL_TOOLS:
+            tools = tuple(tools)
+        if tools == _ALL_TOOLS:
+            precomputed = _PRECOMPUTED.get(engine_type)
+            if precomputed is not None:
+                return precomputed
+        return _format_cached(engine_type, tools)
+
+
+@lru_cache(maxsize=8)
+def _format_cached(engine_type: str, tools: Tuple[ToolDefinition, ...]) -> List[Dict[str, Any]]:
+    """按（引擎类型, 工具元组）缓存格式化结果；工具定义按身份哈希，结果不应修改"""
+    return _FORMATTERS.get(engine_type, to_openai)(tools)
+
+
+# 引擎类型（小写） -> 格式转换函数
+_FORMATTERS = {
+    "openai": to_openai,
+    "anthropic": to_anthropic,
+    "ollama": to_openai,
+    "qwen": to_openai,
+    "deepseek": to_openai,
+}
+
+# 工具名 -> 完整OpenAI格式定义
+_SCHEMA_REGISTRY: Dict[str, Dict[str, Any]] = {tool.name: tool.to_openai_format() for tool in _ALL_TOOLS}
+
+# 默认工具集在各引擎下的格式列表
+_PRECOMPUTED: Dict[str, List[Dict[str, Any]]] = {
+    engine: formatter(_ALL_TOOLS) for engine, formatter in _FORMATTERS.items()
+}
+
+# 工具定义不变，请求体中的tools部分可以直接复用序列化结果
+_OPENAI_JSON = ToolCallingFormatter.to_openai_json(_ALL_TOOLS)
 
 
 def get_tool_by_name(name: str) -> Optional[ToolDefinition]:
     """根据名称获取工具定义"""
-    for tool in get_all_tool_definitions():
-        if tool.name == name:
-            return tool
-    return None
+    return _TOOLS_BY_NAME.get(name)
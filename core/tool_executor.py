@@ -2,21 +2,218 @@
 工具执行器 - 执行Tool Calling请求的工具
 将LLM的工具调用请求转换为实际命令执行
 """
+from array import array
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Hashable, Iterator
 from pathlib import Path
 from datetime import datetime
 import traceback
+import codecs
+import fnmatch
+import functools
+import heapq
+import html
 import json
+import locale
+import mmap
+import re
+import selectors
+import shlex
+import sys
 import subprocess
+import shutil
 import os
 import threading
+import time
 import queue
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 
 from core.file_manager import FileManager
+from core.tool_definitions import get_tool_by_name
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(data: Any) -> str:
+    """序列化工具返回的数据，优先使用orjson；非ASCII字符原样保留"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False)
+
+
+# 超过该大小的文件读取时使用mmap定位行范围
+MMAP_READ_THRESHOLD = 16 * 1024 * 1024
+
+# glob/grep 返回的最大结果数
+MAX_RESULTS = 100
+
+# 超过该大小的文件做单处替换时用mmap原地修改
+MMAP_EDIT_THRESHOLD = 1024 * 1024
+
+# ripgrep搜索超时（秒），超时后改用Python实现
+RG_TIMEOUT = 30
+
+# Python实现搜索多个文件时的并发线程数；匹配本身受GIL限制，线程多了只增加切换开销
+GREP_WORKERS = min(8, os.cpu_count() or 1)
+
+# bash工具在该时间（秒）内没有新输出时终止进程
+BASH_IDLE_TIMEOUT = 5.0
+
+# Windows的管道不支持select，仍使用读取线程
+_USE_SELECTORS = sys.platform != "win32"
+
+# 出现这些字符时命令交给shell执行
+_SHELL_METACHARACTERS = frozenset("|&;<>$`*?~()[]{}!#\\\n")
+
+# 与 text=True 时的解码方式一致
+_OUTPUT_ENCODING = locale.getpreferredencoding(False)
+
+
+# 搜索文件时跳过的目录
+SKIP_DIRS = frozenset({".git", "node_modules", "__pycache__", ".venv"})
+
+
+def _walk(root: str, skip=SKIP_DIRS) -> Iterator[os.DirEntry]:
+    """用scandir遍历root下的文件和目录（不含root本身），跳过skip中的目录且不进入符号链接目录"""
+    stack = [root]
+    while stack:
+        try:
+            iterator = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if entry.name in skip:
+                        continue
+                    stack.append(entry.path)
+                yield entry
+
+
+# 设置环境变量 DEBUG_TOOLS=1 时工具异常附带完整调用栈
+_DEBUG_TOOLS = os.environ.get("DEBUG_TOOLS") == "1"
+
+# webfetch最多读取的字节数、结果缓存条数和有效期（秒）
+WEBFETCH_MAX_BYTES = 200_000
+WEBFETCH_CACHE_SIZE = 64
+WEBFETCH_CACHE_TTL = 300.0
+
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_web_session: Optional[requests.Session] = None
+_web_session_lock = threading.Lock()
+
+
+def _get_web_session() -> requests.Session:
+    """webfetch共用的HTTP会话（与原实现一样不校验证书）"""
+    global _web_session
+    if _web_session is None:
+        with _web_session_lock:
+            if _web_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["User-Agent"] = "Mozilla/5.0 (compatible; CodeAssistant/1.0)"
+                _web_session = session
+    return _web_session
+
+
+_grep_pool: Optional[ThreadPoolExecutor] = None
+_grep_pool_lock = threading.Lock()
+
+
+def _get_grep_pool() -> ThreadPoolExecutor:
+    """获取进程内共享的grep线程池（首次使用时创建）"""
+    global _grep_pool
+    if _grep_pool is None:
+        with _grep_pool_lock:
+            if _grep_pool is None:
+                _grep_pool = ThreadPoolExecutor(max_workers=GREP_WORKERS, thread_name_prefix="grep")
+    return _grep_pool
+
+
+@functools.lru_cache(maxsize=None)
+def _find_rg() -> Optional[str]:
+    """查找ripgrep可执行文件（进程内只扫描一次PATH）"""
+    return shutil.which("rg")
+
+
+# 文本文件判断：取样字节数和控制字符比例上限
+TEXT_SNIFF_BYTES = 512
+_CONTROL_BYTES = bytes(c for c in range(32) if c < 9 or 13 < c)
+
+
+def _is_text(path: str, sample: int = TEXT_SNIFF_BYTES) -> bool:
+    """读取文件开头少量字节判断是否为文本：含NUL或控制字符超过30%视为二进制"""
+    with open(path, 'rb') as f:
+        head = f.read(sample)
+    if b'\x00' in head:
+        return False
+    if not head:
+        return True
+    control = len(head) - len(head.translate(None, _CONTROL_BYTES))
+    return control / len(head) < 0.30
+
+
+def _walk_files(root: str, include: Optional[str] = None) -> Iterator[str]:
+    """一次遍历产出root下的文件路径；include 为空格分隔的文件名通配符，不指定时接受所有文件"""
+    include_match = _compile_include(include).match if include else None
+    for entry in _walk(root):
+        try:
+            if not entry.is_file():
+                continue
+        except OSError:
+            continue
+        if include_match is None or include_match(entry.name):
+            yield entry.path
+
+
+def _encode_text(content: str) -> bytes:
+    """按 write_text 的方式编码要写入的文本（UTF-8，换行转换为系统换行符）"""
+    encoded = content.encode('utf-8')
+    if os.linesep != '\n':
+        encoded = encoded.replace(b'\n', os.linesep.encode())
+    return encoded
 
 
-@dataclass
+@functools.lru_cache(maxsize=256)
+def _compile_pattern(pattern: str) -> "re.Pattern":
+    """编译grep的搜索模式（同一任务中常用相同模式搜索多个路径）"""
+    return re.compile(pattern)
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_glob(pattern: str) -> "re.Pattern":
+    """将文件名通配符编译为正则，与 fnmatch 一样在Windows上不区分大小写"""
+    return re.compile(fnmatch.translate(pattern), re.IGNORECASE if os.name == "nt" else 0)
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_include(include: str) -> "re.Pattern":
+    """将空格分隔的文件名通配符编译为一个正则，与 fnmatch 一样在Windows上不区分大小写"""
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    return re.compile("|".join(fnmatch.translate(p) for p in include.split()), flags)
+
+
+@dataclass(slots=True)
 class ToolResult:
     """工具执行结果"""
     success: bool
@@ -27,7 +224,7 @@ class ToolResult:
     timestamp: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolResponse:
     """统一工具响应格式"""
     success: bool
@@ -58,21 +255,114 @@ class ToolResponse:
         return cls(success=False, content="", error=error, data=data)
 
 
+class _LRUCache:
+    """线程安全的LRU缓存（只读工具可能在线程池中并行执行）"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class HistoryStore:
+    """
+    工具执行历史 - 按列存储
+
+    参数和响应只保存对象引用，不序列化也不复制其中的大字符串（write内容、read结果等）；
+    时间戳以纳秒整数保存，读取历史时才格式化。
+    """
+
+    def __init__(self):
+        # 只读工具会在线程池中并行执行，各列的追加需要一起完成
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.tools: List[str] = []
+        self.args: List[Dict[str, Any]] = []
+        self.payloads: List[Any] = []
+        self.success = array("B")
+        self.is_error = array("B")
+        self.ts = array("q")
+
+    def append(self, tool: str, args: Dict[str, Any], success: bool, payload: Any, ts_ns: int, error: bool = False):
+        """追加一条记录；payload 为响应字典，error 为 True 时为错误信息"""
+        with self._lock:
+            self.tools.append(tool)
+            self.args.append(args)
+            self.payloads.append(payload)
+            self.success.append(success)
+            self.is_error.append(error)
+            self.ts.append(ts_ns)
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """按原有的字典格式逐条生成记录"""
+        for i in range(len(self)):
+            yield {
+                "tool": self.tools[i],
+                "arguments": self.args[i],
+                "success": bool(self.success[i]),
+                "error" if self.is_error[i] else "response": self.payloads[i],
+                "timestamp": datetime.fromtimestamp(self.ts[i] / 1e9).isoformat()
+            }
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """转换为字典列表"""
+        return list(self)
+
+    def clear(self):
+        """清空记录"""
+        with self._lock:
+            self._reset()
+
+
 class ToolExecutor:
     """工具执行器 - 执行LLM请求的工具调用"""
 
+    READ_CACHE_SIZE = 256
+    GREP_CACHE_SIZE = 4096
+
     def __init__(self, file_manager: FileManager, workdir: str = ".", session_manager=None):
         self.file_manager = file_manager
         self.workdir = Path(workdir).resolve()
-        self._execution_history: List[Dict[str, Any]] = []
+        self._workdir_str = str(self.workdir)
+        self._workdir_prefix = os.path.join(self._workdir_str, "")
+        self._execution_history = HistoryStore()
         self._todo_list: List[Dict[str, Any]] = []
         self._session_manager = session_manager
+        # 以文件 (路径, mtime, 大小) 为键缓存读取和搜索结果，文件变化后键自然失效
+        self._read_cache = _LRUCache(self.READ_CACHE_SIZE)
+        self._grep_cache = _LRUCache(self.GREP_CACHE_SIZE)
+        self._webfetch_cache = _LRUCache(WEBFETCH_CACHE_SIZE)
+        # bash工具子进程的环境变量，创建时复制一次，各命令共用
+        self._bash_env = {**os.environ, "FORCE_COLOR": "1"}
 
         self._register_tools()
     
     def _register_tools(self):
-        """注册所有可用工具"""
-        self.tools = {
+        """注册所有可用工具（按工具定义中的必填参数包装成分发函数）"""
+        handlers = {
             "read": self._execute_read,
             "write": self._execute_write,
             "edit": self._execute_edit,
@@ -85,13 +375,24 @@ class ToolExecutor:
             "skill": self._execute_skill,
             "session_detail": self._execute_session_detail,
         }
+        self.tools = {}
+        for name, handler in handlers.items():
+            definition = get_tool_by_name(name)
+            required = tuple(definition.parameters.get("required", ())) if definition else ()
+            self.tools[name] = functools.partial(self._dispatch, handler, required) if required else handler
+
+    @staticmethod
+    def _dispatch(handler: Callable[[Dict[str, Any]], "ToolResponse"], required: tuple, args: Dict[str, Any]) -> "ToolResponse":
+        """统一检查必填参数后调用工具函数"""
+        missing = [key for key in required if args.get(key) is None]
+        if missing:
+            return ToolResponse.fail(f"缺少必要参数: {', '.join(missing)}")
+        return handler(args)
     
     def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> ToolResult:
         """执行工具调用"""
-        import time
-        start_time = time.time()
-        
-        if tool_name not in self.tools:
+        func = self.tools.get(tool_name)
+        if func is None:
             return ToolResult(
                 success=False,
                 content="",
@@ -101,20 +402,16 @@ class ToolExecutor:
                 timestamp=datetime.now().isoformat()
             )
         
+        start_time = time.perf_counter()
         try:
-            func = self.tools[tool_name]
             response: ToolResponse = func(arguments)
-            execution_time = time.time() - start_time
+            execution_time = time.perf_counter() - start_time
             
             result_content = self._format_result(response)
+            ts_ns = time.time_ns()
+            timestamp = datetime.fromtimestamp(ts_ns / 1e9).isoformat()
 
-            self._execution_history.append({
-                "tool": tool_name,
-                "arguments": arguments,
-                "success": response.success,
-                "response": response.to_dict(),
-                "timestamp": datetime.now().isoformat()
-            })
+            self._execution_history.append(tool_name, arguments, response.success, response.to_dict(), ts_ns)
             
             return ToolResult(
                 success=response.success,
@@ -122,20 +419,17 @@ class ToolExecutor:
                 error=response.error,
                 tool_name=tool_name,
                 execution_time=execution_time,
-                timestamp=datetime.now().isoformat()
+                timestamp=timestamp
             )
             
         except Exception as e:
-            execution_time = time.time() - start_time
-            error_msg = f"{str(e)}\n{traceback.format_exc()}"
+            execution_time = time.perf_counter() - start_time
+            # 调用栈只在调试时附带，一般错误信息已足够
+            error_msg = f"{str(e)}\n{traceback.format_exc()}" if _DEBUG_TOOLS else str(e)
+            ts_ns = time.time_ns()
+            timestamp = datetime.fromtimestamp(ts_ns / 1e9).isoformat()
             
-            self._execution_history.append({
-                "tool": tool_name,
-                "arguments": arguments,
-                "success": False,
-                "error": str(e),
-                "timestamp": datetime.now().isoformat()
-            })
+            self._execution_history.append(tool_name, arguments, False, str(e), ts_ns, error=True)
             
             return ToolResult(
                 success=False,
@@ -143,7 +437,7 @@ class ToolExecutor:
                 error=error_msg,
                 tool_name=tool_name,
                 execution_time=execution_time,
-                timestamp=datetime.now().isoformat()
+                timestamp=timestamp
             )
     
     def _format_result(self, result: ToolResponse) -> str:
@@ -156,7 +450,7 @@ class ToolExecutor:
             parts.append(result.content)
 
         if result.data:
-            parts.append(json.dumps(result.data))
+            parts.append(_dumps(result.data))
 
         if result.error:
             parts.append(result.error)
@@ -167,27 +461,36 @@ class ToolExecutor:
     
     def get_execution_history(self) -> List[Dict[str, Any]]:
         """获取执行历史"""
-        return self._execution_history.copy()
+        return self._execution_history.to_list()
     
+    def warmup(self):
+        """预先完成首次调用工具时才做的初始化（webfetch的HTTP会话、ripgrep查找）"""
+        _get_web_session()
+        _find_rg()
+
     def clear_history(self):
-        """清空执行历史"""
+        """清空执行历史及文件结果缓存"""
         self._execution_history.clear()
+        self._read_cache.clear()
+        self._grep_cache.clear()
+        self._webfetch_cache.clear()
     
     def _resolve_path(self, file_path: str) -> Path:
         """解析文件路径 - 强制使用workdir下的相对路径"""
-        path = Path(file_path)
-        
-        # 如果是绝对路径，强制转换为相对于workdir的路径
-        if path.is_absolute():
+        # 用字符串操作解析，只在最后构造一次Path
+        workdir = self._workdir_str
+        if os.path.isabs(file_path):
+            # 绝对路径强制转换为相对于workdir的路径
             try:
-                # 尝试提取相对于workdir的部分
-                rel_path = path.relative_to(self.workdir)
-                return self.workdir / rel_path
+                rel_path = os.path.relpath(file_path, workdir)
             except ValueError:
+                rel_path = os.pardir
+            if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
                 # 路径不在workdir下，强制使用文件名部分
-                return self.workdir / path.name
+                rel_path = os.path.basename(file_path)
+            return Path(os.path.join(workdir, rel_path))
         
-        return self.workdir / file_path
+        return Path(os.path.join(workdir, file_path))
     
     def _execute_read(self, args: Dict[str, Any]) -> ToolResponse:
         """读取文件"""
@@ -206,39 +509,71 @@ class ToolExecutor:
             
             if path.is_dir():
                 return ToolResponse.fail(f"是目录而非文件: {file_path}")
+
+            st = path.stat()
+            key = (str(path), st.st_mtime_ns, st.st_size, offset, limit)
+            cached = self._read_cache.get(key)
+            if cached is not None:
+                content, data = cached
+                return ToolResponse.ok(content=content, data=dict(data))
             
-            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = []
-                line_number = 0
-                
-                for line in f:
-                    line_number += 1
-                    
-                    if line_number > offset:
-                        if len(line) > 2000:
-                            current_line = line[:2000]
-                        else:
-                            current_line = line
-                        lines.append(current_line)
-                        
-                        if len(lines) >= limit:
-                            break
-                
-                content = ''.join(lines)
-                actual_line_count = len(content.split('\n'))
-                
-                return ToolResponse.ok(
-                    content=content,
-                    data={
-                        "path": str(path.absolute()),
-                        "size": len(content.encode('utf-8')),
-                        "lines": actual_line_count,
-                        "truncated": line_number > offset + limit
-                    }
-                )
+            if not _is_text(str(path)):
+                return ToolResponse.fail(f"二进制文件，无法按文本读取: {file_path}")
+
+            content, size, truncated = self._read_lines(path, st.st_size, offset, max(limit, 1))
+            data = {
+                "path": str(path.absolute()),
+                "size": size,
+                "lines": content.count('\n') + 1,
+                "truncated": truncated
+            }
+            self._read_cache.put(key, (content, data))
+
+            return ToolResponse.ok(content=content, data=dict(data))
         except Exception as e:
             return ToolResponse.fail(f"读取失败: {str(e)}")
     
+    @staticmethod
+    def _read_lines(path: Path, size: int, offset: int, limit: int):
+        """
+        按字节读取文件第 offset 行起的最多 limit 行，只解码选中的部分
+
+        Returns:
+            (内容, 选中部分在文件中的字节数, 之后是否还有未读取的内容)；每行最多保留2000字符，\r\n 换行统一为 \n
+        """
+        end = offset + limit
+        if size > MMAP_READ_THRESHOLD:
+            # 大文件用mmap只定位所需行的字节范围，不把整个文件读入内存
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = None
+                stop = 0
+                for line_index in range(end):
+                    if line_index == offset:
+                        start = stop
+                    newline = mm.find(b'\n', stop)
+                    if newline < 0:
+                        stop = size
+                        break
+                    stop = newline + 1
+                chunk = mm[start:stop] if start is not None else b''
+            truncated = stop < size
+            parts = chunk.split(b'\n')
+        else:
+            parts = path.read_bytes().split(b'\n', end)
+            truncated = len(parts) > end and parts[-1] != b''
+            if len(parts) > end:
+                # 选中的最后一行后面还有换行
+                parts = parts[offset:end]
+                parts.append(b'')
+            else:
+                parts = parts[offset:]
+
+        # UTF-8 多字节字符不含 0x0A，先按字节切行再解码是安全的
+        raw = b'\n'.join(parts)
+        text = raw.decode('utf-8', errors='ignore')
+        content = '\n'.join(line.removesuffix('\r')[:2000] for line in text.split('\n'))
+        return content, len(raw), truncated
+
     def _execute_write(self, args: Dict[str, Any]) -> ToolResponse:
         """写入文件"""
         file_path = args.get("filePath")
@@ -254,13 +589,14 @@ class ToolExecutor:
                 return ToolResponse.fail(f"是目录而非文件: {file_path}")
             
             path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text(content, encoding='utf-8')
+            encoded = _encode_text(content)
+            path.write_bytes(encoded)
             
             return ToolResponse.ok(
                 content=f"已写入文件: {path}",
                 data={
                     "path": str(path.absolute()),
-                    "size": len(content.encode('utf-8'))
+                    "size": len(encoded)
                 }
             )
         except Exception as e:
@@ -281,31 +617,84 @@ class ToolExecutor:
             
             if not path.exists():
                 return ToolResponse.fail(f"文件不存在: {file_path}")
+
+            if not replace_all and os.linesep == '\n' and path.stat().st_size > MMAP_EDIT_THRESHOLD:
+                response = self._edit_in_place(path, old_text, new_text)
+                if response is not None:
+                    return response
             
             content = path.read_text(encoding='utf-8')
             
-            if old_text not in content:
-                return ToolResponse.fail("未找到匹配文本")
-            
+            # 查找和替换在一次扫描中完成
             if replace_all:
-                new_content = content.replace(old_text, new_text)
-                replacement_count = content.count(old_text)
+                parts = content.split(old_text)
+                replacement_count = len(parts) - 1
+                new_content = new_text.join(parts)
             else:
-                new_content = content.replace(old_text, new_text, 1)
-                replacement_count = 1
+                index = content.find(old_text)
+                replacement_count = 0
+                if index >= 0:
+                    replacement_count = 1
+                    new_content = content[:index] + new_text + content[index + len(old_text):]
+
+            if replacement_count == 0:
+                return ToolResponse.fail("未找到匹配文本")
             
-            path.write_text(new_content, encoding='utf-8')
+            encoded = _encode_text(new_content)
+            path.write_bytes(encoded)
             
             return ToolResponse.ok(
                 content=f"已完成替换（{replacement_count}处）",
                 data={
                     "path": str(path.absolute()),
-                    "size": len(new_content.encode('utf-8'))
+                    "size": len(encoded)
                 }
             )
         except Exception as e:
             return ToolResponse.fail(f"编辑失败: {str(e)}")
 
+    @staticmethod
+    def _edit_in_place(path: Path, old_text: str, new_text: str) -> Optional[ToolResponse]:
+        """
+        大文件单处替换：用mmap按字节定位，只改写匹配位置及其后的部分
+
+        Returns:
+            替换结果；文件含 \r（需要按文本方式统一换行）时返回None，由调用方按字符串方式处理
+        """
+        needle = old_text.encode('utf-8')
+        replacement = new_text.encode('utf-8')
+        with open(path, 'r+b') as f:
+            with mmap.mmap(f.fileno(), 0) as mm:
+                if mm.find(b'\r') >= 0:
+                    return None
+                index = mm.find(needle)
+                if index < 0:
+                    return ToolResponse.fail("未找到匹配文本")
+                if len(replacement) == len(needle):
+                    # 长度相同时直接覆盖，文件其余部分不动
+                    mm[index:index + len(needle)] = replacement
+                    mm.flush()
+                    size = len(mm)
+                    tail = None
+                else:
+                    tail = mm[index + len(needle):]
+            if tail is not None:
+                f.seek(index)
+                f.write(replacement)
+                f.write(tail)
+                f.truncate()
+                size = f.tell()
+        # 通过mmap写入不保证立即更新mtime，主动更新以免读取缓存命中旧内容
+        os.utime(path)
+
+        return ToolResponse.ok(
+            content="已完成替换（1处）",
+            data={
+                "path": str(path.absolute()),
+                "size": size
+            }
+        )
+
     def _execute_glob(self, args: Dict[str, Any]) -> ToolResponse:
         """文件模式匹配"""
         pattern = args.get("pattern")
@@ -326,15 +715,31 @@ class ToolExecutor:
             elif not search_path.is_dir():
                 return ToolResponse.fail(f"不是有效的路径: {path}")
 
-            files = list(search_dir.rglob(pattern))
-            files = [str(f.relative_to(self.workdir) if f.is_relative_to(self.workdir) else f) for f in files]
-            files.sort()
+            # 只含文件名部分的模式用scandir遍历匹配，带目录层级的模式仍交给rglob
+            name_pattern = pattern.removeprefix("**/")
+            if "/" in name_pattern or os.sep in name_pattern:
+                matches = (str(f.relative_to(self.workdir) if f.is_relative_to(self.workdir) else f)
+                           for f in search_dir.rglob(pattern))
+            else:
+                match = _compile_glob(name_pattern).match
+                matches = (self._relative(entry.path) for entry in _walk(str(search_dir)) if match(entry.name))
+
+            # 只返回排序后的前 MAX_RESULTS 项：边遍历边计数，用堆做部分排序，不保留全部匹配
+            count = 0
+
+            def counted(items):
+                nonlocal count
+                for item in items:
+                    count += 1
+                    yield item
+
+            files = heapq.nsmallest(MAX_RESULTS, counted(matches))
 
             return ToolResponse.ok(
-                content=f"找到 {len(files)} 个匹配文件",
+                content=f"找到 {count} 个匹配文件",
                 data={
-                    "files": files[:100],
-                    "count": len(files)
+                    "files": files,
+                    "count": count
                 }
             )
         except Exception as e:
@@ -350,44 +755,118 @@ class ToolExecutor:
             return ToolResponse.fail("缺少搜索模式")
         
         try:
-            import re
             search_path = self._resolve_path(path)
             
             if not search_path.exists():
                 return ToolResponse.fail(f"路径不存在: {path}")
             
-            regex = re.compile(pattern)
-            results = []
-            
-            if search_path.is_file():
-                files = [search_path]
+            regex = _compile_pattern(pattern)
+            rg_results = None
+
+            if search_path.is_dir():
+                rg_results = self._grep_with_rg(pattern, search_path, include)
+
+            if rg_results is not None:
+                results = rg_results[:MAX_RESULTS]
+                count = len(rg_results)
             else:
-                files = search_path.rglob("*") if include else search_path.glob("**/*")
-                files = [f for f in files if f.is_file()]
-                if include:
-                    from fnmatch import fnmatch
-                    files = [f for f in files if any(fnmatch(f.name, p) for p in include.split())]
-            
-            for file_path in files:
-                try:
-                    lines = file_path.read_text(encoding='utf-8').split('\n')
-                    for i, line in enumerate(lines):
-                        if regex.search(line):
-                            rel_path = str(file_path.relative_to(self.workdir)) if file_path.is_relative_to(self.workdir) else str(file_path)
-                            results.append(f"{rel_path}:{i+1}:{line.rstrip()}")
-                except Exception:
-                    continue
+                # 只保留返回的前 MAX_RESULTS 条，其余只计数
+                results = []
+                count = 0
+                if search_path.is_file():
+                    files = [str(search_path)]
+                else:
+                    files = list(_walk_files(str(search_path), include))
+
+                def scan(file_path: str) -> List[str]:
+                    try:
+                        return self._grep_file(file_path, regex)
+                    except Exception:
+                        return []
+
+                if len(files) > 1 and GREP_WORKERS > 1:
+                    # 逐文件读取和匹配互不依赖，用共享线程池重叠文件I/O；map保持原有的文件顺序
+                    file_results_iter = _get_grep_pool().map(scan, files)
+                else:
+                    file_results_iter = map(scan, files)
+                for file_results in file_results_iter:
+                    count += len(file_results)
+                    if len(results) < MAX_RESULTS:
+                        results.extend(file_results[:MAX_RESULTS - len(results)])
             
             return ToolResponse.ok(
-                content=f"找到 {len(results)} 条匹配结果",
+                content=f"找到 {count} 条匹配结果",
                 data={
-                    "results": results[:100],
-                    "count": len(results)
+                    "results": results,
+                    "count": count
                 }
             )
         except Exception as e:
             return ToolResponse.fail(f"搜索失败: {str(e)}")
     
+    def _grep_with_rg(self, pattern: str, search_path: Path, include: Optional[str]) -> Optional[List[str]]:
+        """
+        使用ripgrep搜索目录
+
+        Returns:
+            "相对路径:行号:内容" 格式的结果；rg不可用、超时或不支持该正则时返回None，由调用方走Python实现
+        """
+        rg = _find_rg()
+        if rg is None:
+            return None
+
+        # 与Python实现保持一致：搜索隐藏文件且不读取.gitignore；按路径排序保证结果稳定
+        command = [rg, "--no-config", "--no-heading", "--line-number", "--color=never",
+                   "--hidden", "--no-ignore", "--sort=path", "-e", pattern]
+        for glob_pattern in (include or "").split():
+            command += ["-g", glob_pattern]
+        for skipped in SKIP_DIRS:
+            command += ["-g", f"!{skipped}"]
+        if search_path != self.workdir:
+            command.append(str(search_path.relative_to(self.workdir)) if search_path.is_relative_to(self.workdir) else str(search_path))
+
+        try:
+            completed = subprocess.run(
+                command,
+                cwd=str(self.workdir),
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                timeout=RG_TIMEOUT
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+
+        # 0: 有匹配，1: 无匹配，其他（如正则语法不兼容）交给Python实现
+        if completed.returncode not in (0, 1):
+            return None
+        return [line.rstrip() for line in completed.stdout.splitlines()]
+
+    def _grep_file(self, file_path: str, regex) -> List[str]:
+        """搜索单个文件的匹配行，结果按 (文件, mtime, 大小, 模式) 缓存"""
+        st = os.stat(file_path)
+        key = (file_path, st.st_mtime_ns, st.st_size, regex.pattern)
+        matches = self._grep_cache.get(key)
+        if matches is None:
+            matches = []
+            if not _is_text(file_path):
+                self._grep_cache.put(key, ())
+                return matches
+            with open(file_path, 'r', encoding='utf-8') as f:
+                lines = f.read().split('\n')
+            rel_path = self._relative(file_path)
+            for i, line in enumerate(lines):
+                if regex.search(line):
+                    matches.append(f"{rel_path}:{i+1}:{line.rstrip()}")
+            self._grep_cache.put(key, tuple(matches))
+        return matches
+
+    def _relative(self, path: str) -> str:
+        """工作目录下的路径转换为相对路径字符串"""
+        prefix = self._workdir_prefix
+        return path[len(prefix):] if path.startswith(prefix) else path
+
     def _execute_bash(self, args: Dict[str, Any]) -> ToolResponse:
         """执行命令"""
         command = args.get("command")
@@ -404,55 +883,20 @@ class ToolExecutor:
                 cwd = self.workdir
 
         try:
-            process = subprocess.Popen(
-                command,
-                shell=True,
+            argv = self._split_simple_command(command)
+            popen_kwargs = dict(
+                shell=argv is None,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
                 cwd=str(cwd),
-                env={**os.environ, "FORCE_COLOR": "1"},
-                bufsize=1
+                env=self._bash_env,
             )
-
-            output_queue = queue.Queue()
-            output_lines = []
-            timeout_seconds = 5.0
-
-            def read_output():
-                try:
-                    for line in iter(process.stdout.readline, ''):
-                        if line:
-                            output_queue.put(line)
-                        else:
-                            break
-                except Exception:
-                    pass
-                finally:
-                    output_queue.put(None)
-
-            reader_thread = threading.Thread(target=read_output, daemon=True)
-            reader_thread.start()
-
-            last_output_time = threading.Event()
-            last_output_time.set()
-
-            while True:
-                try:
-                    line = output_queue.get(timeout=timeout_seconds)
-                    if line is None:
-                        break
-                    output_lines.append(line.rstrip())
-                    print(line, end='')
-                    last_output_time.set()
-                except queue.Empty:
-                    print(f"\n[超时] {timeout_seconds}秒内无新输出，停止服务")
-                    process.terminate()
-                    try:
-                        process.wait(timeout=2)
-                    except subprocess.TimeoutExpired:
-                        process.kill()
-                    break
+            if _USE_SELECTORS:
+                process = subprocess.Popen(argv or command, bufsize=0, **popen_kwargs)
+                output_lines = self._collect_output_select(process, BASH_IDLE_TIMEOUT)
+            else:
+                process = subprocess.Popen(argv or command, text=True, bufsize=1, **popen_kwargs)
+                output_lines = self._collect_output_threaded(process, BASH_IDLE_TIMEOUT)
 
             exit_code = process.returncode
 
@@ -481,6 +925,107 @@ class ToolExecutor:
             return ToolResponse.fail(f"命令执行超时（{timeout/1000}秒）")
         except Exception as e:
             return ToolResponse.fail(f"执行失败: {str(e)}")
+
+    @staticmethod
+    def _split_simple_command(command: str) -> Optional[List[str]]:
+        """
+        不含shell语法的简单命令拆分为参数列表，直接执行而不经过 /bin/sh
+
+        Returns:
+            参数列表；命令含管道、重定向、变量展开等shell语法，或首个参数不是可执行文件（如cd等内建命令）时返回None
+        """
+        if not _USE_SELECTORS or any(c in _SHELL_METACHARACTERS for c in command):
+            return None
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            return None
+        # 含路径的程序名相对的是命令的工作目录，交给shell解析
+        if not argv or "=" in argv[0] or "/" in argv[0] or shutil.which(argv[0]) is None:
+            return None
+        return argv
+
+    @staticmethod
+    def _stop_idle_process(process: subprocess.Popen, idle_timeout: float):
+        """输出空闲超时后终止进程"""
+        print(f"\n[超时] {idle_timeout}秒内无新输出，停止服务")
+        process.terminate()
+        try:
+            process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def _collect_output_select(self, process: subprocess.Popen, idle_timeout: float) -> List[str]:
+        """
+        用selectors直接等待stdout可读，实时输出并收集各行（POSIX）
+
+        idle_timeout 秒内没有新输出时终止进程；输出结束后等待进程退出以取得退出码。
+        """
+        fd = process.stdout.fileno()
+        os.set_blocking(fd, False)
+        decoder = codecs.getincrementaldecoder(_OUTPUT_ENCODING)(errors="replace")
+        output_lines = []
+        pending = ""
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while True:
+                if not selector.select(timeout=idle_timeout):
+                    self._stop_idle_process(process, idle_timeout)
+                    break
+                try:
+                    chunk = os.read(fd, 65536)
+                except BlockingIOError:
+                    continue
+                if not chunk:
+                    break
+                text = decoder.decode(chunk)
+                print(text, end="", flush=True)
+                # 不完整的最后一行留到下一块输出再拼接
+                *lines, pending = (pending + text).split("\n")
+                output_lines.extend(line.rstrip() for line in lines)
+
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            print(pending)
+            output_lines.append(pending.rstrip())
+        process.stdout.close()
+        process.wait()
+        return output_lines
+
+    def _collect_output_threaded(self, process: subprocess.Popen, idle_timeout: float) -> List[str]:
+        """由读取线程逐行转发输出，实时输出并收集各行（管道不支持select的平台）"""
+        output_queue = queue.Queue()
+        output_lines = []
+
+        def read_output():
+            try:
+                for line in iter(process.stdout.readline, ''):
+                    if line:
+                        output_queue.put(line)
+                    else:
+                        break
+            except Exception:
+                pass
+            finally:
+                output_queue.put(None)
+
+        reader_thread = threading.Thread(target=read_output, daemon=True)
+        reader_thread.start()
+
+        while True:
+            try:
+                line = output_queue.get(timeout=idle_timeout)
+                if line is None:
+                    process.wait()
+                    break
+                output_lines.append(line.rstrip())
+                print(line, end='')
+            except queue.Empty:
+                self._stop_idle_process(process, idle_timeout)
+                break
+        return output_lines
     
     def _execute_todowrite(self, args: Dict[str, Any]) -> ToolResponse:
         """更新任务清单"""
@@ -519,37 +1064,43 @@ class ToolExecutor:
         
         if not url:
             return ToolResponse.fail("缺少URL参数")
+
+        key = (url, format_type)
+        cached = self._webfetch_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < WEBFETCH_CACHE_TTL:
+            _, content, data = cached
+            return ToolResponse.ok(content=content, data=dict(data))
         
         try:
-            import urllib.request
-            import ssl
-            
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            
-            req = urllib.request.Request(url, headers={
-                'User-Agent': 'Mozilla/5.0 (compatible; CodeAssistant/1.0)'
-            })
-            
-            with urllib.request.urlopen(req, timeout=30, context=ssl_context) as response:
-                content = response.read().decode('utf-8', errors='ignore')
+            # 复用连接池中的连接，同一主机的后续请求省去TLS握手；只读取前 WEBFETCH_MAX_BYTES 字节
+            chunks = []
+            total = 0
+            # 不校验证书的警告只在这次请求中屏蔽，不影响LLM接口等其他会话
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", urllib3.exceptions.InsecureRequestWarning)
+                with _get_web_session().get(url, timeout=30, stream=True, verify=False) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(65536):
+                        chunks.append(chunk)
+                        total += len(chunk)
+                        if total >= WEBFETCH_MAX_BYTES:
+                            break
+            content = b"".join(chunks).decode('utf-8', errors='ignore')
             
             if format_type == "text":
-                from html import unescape
-                import re
-                content = re.sub(r'<[^>]+>', '', content)
-                content = unescape(content)
-                content = re.sub(r'\s+', ' ', content).strip()
+                content = _HTML_TAG_RE.sub('', content)
+                content = html.unescape(content)
+                content = _WHITESPACE_RE.sub(' ', content).strip()
+
+            data = {
+                "url": url,
+                "format": format_type,
+                "size": len(content)
+            }
+            content = content[:5000]
+            self._webfetch_cache.put(key, (time.monotonic(), content, data))
             
-            return ToolResponse.ok(
-                content=content[:5000] if len(content) > 5000 else content,
-                data={
-                    "url": url,
-                    "format": format_type,
-                    "size": len(content)
-                }
-            )
+            return ToolResponse.ok(content=content, data=dict(data))
         except Exception as e:
             return ToolResponse.fail(f"获取失败: {str(e)}")
     
@@ -2,33 +2,153 @@
 会话感知Agent引擎 - 集成会话管理的Agent
 """
 import os
-import argparse
-from typing import Optional, Iterator, Dict, Any
+import sys
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Iterator, Dict, Any, List, Tuple, TYPE_CHECKING
 
 from config import MODEL_CONFIG
-from core.llm_engine import LLMFactory
-from core.tool_executor import ToolExecutor
-from core.agent_engine import AgentEngine, AgentConfig
 from core.file_manager import FileManager
-from core.session_manager import SessionManager, SessionStep
+from core.session_manager import SessionManager
+
+# LLM引擎、工具执行器、Agent及asyncio在用到时才导入（依赖requests等较重的模块），
+# 使 --help 等不需要引擎的路径快速返回
+if TYPE_CHECKING:
+    from core.llm_engine import LLMEngine, LLMFactory
+    from core.tool_executor import ToolExecutor
+    from core.agent_engine import AgentEngine
+
+# 退出命令；最长的只有4个字符，更长的输入不必转小写比较
+_QUIT_COMMANDS = frozenset(('quit', 'exit', 'q', '退出'))
+_QUIT_MAX_LEN = max(map(len, _QUIT_COMMANDS))
+
+# LLM响应缓存目录：放在用户缓存目录下，不写入用户的项目
+LLM_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "code-assistant", "llm"
+)
+
+
+# 非终端输入时已从标准输入读到、尚未返回的字节
+_stdin_pending = bytearray()
+
+
+def _read_line_raw(prompt: str) -> str:
+    """
+    直接从标准输入的文件描述符读取一行（标准输入不是终端时使用）
+
+    不经过sys.stdin的缓冲区：守护线程阻塞在缓冲读取中时，解释器退出会因拿不到缓冲区的锁而崩溃。
+    """
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    fd = sys.stdin.fileno()
+    while b"\n" not in _stdin_pending:
+        chunk = os.read(fd, 4096)
+        if not chunk:
+            if not _stdin_pending:
+                raise EOFError
+            break
+        _stdin_pending.extend(chunk)
+    line, _, rest = bytes(_stdin_pending).partition(b"\n")
+    _stdin_pending[:] = rest
+    return line.decode(sys.stdin.encoding or "utf-8", errors="replace").rstrip("\r")
+
+
+async def _ainput(prompt: str = "") -> str:
+    """
+    异步读取一行输入，等待期间事件循环可以继续处理后台任务
+
+    终端输入在线程中调用input()，保留readline的行编辑和历史；一次粘贴多行也能逐行读到。
+    使用守护线程而不是默认执行器：Ctrl-C退出时不必等这次输入返回。
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def deliver(setter, value):
+        if not future.done():
+            setter(value)
+
+    def read():
+        try:
+            line = input(prompt) if sys.stdin.isatty() else _read_line_raw(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(deliver, future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(deliver, future.set_result, line)
+
+    threading.Thread(target=read, name="stdin-reader", daemon=True).start()
+    return await future
 
 
 class SessionAwareCodeAssistant:
     """会话感知代码助手"""
 
-    def __init__(self, workdir: str = None):
+    CONTEXT_CACHE_SIZE = 8
+    # 相同任务响应缓存保留的条目数
+    RESPONSE_CACHE_SIZE = 32
+    _BANNER_TEMPLATE = (
+        "=" * 60 + "\n"
+        "  AI Agent - 智能编程助手 (会话模式)\n"
+        + "=" * 60 + "\n"
+        "工作目录: {workdir}\n"
+        "最大迭代次数: {max_iterations}\n"
+    )
+    _HELP_TEXT = (
+        "-" * 60 + "\n"
+        "输入您的任务描述，或输入 'quit'/'exit' 退出\n"
+        "示例: 创建一个HTTP服务器\n"
+        "会话管理命令:\n"
+        "  /new           - 创建新会话\n"
+        "  /show          - 列出所有会话\n"
+        "  /switch <id>   - 切换到指定会话\n"
+        "  /delete <id>   - 删除会话\n"
+        + "=" * 60 + "\n"
+    )
+    # 会话管理命令 -> 处理方法名
+    _COMMANDS = {
+        "/new": "_handle_new_command",
+        "/show": "_handle_show_command",
+        "/switch": "_handle_switch_command",
+        "/delete": "_handle_delete_command",
+    }
+
+    def __init__(self, workdir: str = None, response_cache: bool = False):
         self.workdir = os.getcwd() if workdir is None else workdir
         self.backup_dir = os.path.join(self.workdir, "backups")
         self.file_manager = FileManager(self.workdir, self.backup_dir)
         self.session_manager = SessionManager()
 
-        self.llm_factory = LLMFactory()
-        self.llm_engine = None
-        self.tool_executor = None
-        self.agent = None
-
-    def setup_engine(self):
-        """初始化LLM引擎"""
+        self.llm_factory: Optional["LLMFactory"] = None
+        self.llm_engine: Optional["LLMEngine"] = None
+        self.tool_executor: Optional["ToolExecutor"] = None
+        self.agent: Optional["AgentEngine"] = None
+        # (会话ID, 问题数, 更新时间) -> 会话上下文字符串
+        self._ctx_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        # (会话ID, 工作区版本, 用户输入) -> (会话步骤, 最终总结)，同一会话内重复的任务直接复用结果；
+        # 默认关闭，且只缓存全程只用了只读工具的任务
+        self.response_cache_enabled = response_cache
+        self._response_cache: "OrderedDict[Tuple[str, int, str], Tuple[List[Future], str]]" = OrderedDict()
+        # 任一步骤执行了写文件、命令等工具后递增，之前缓存的结果全部作废
+        self._workspace_generation = 0
+        # 问题记录在单个后台线程中按顺序写入，交互循环不必等待磁盘写入
+        self._persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-persist")
+        self._pending_persist: Optional[Future] = None
+
+    def setup_engine(self, warmup: Optional[bool] = None):
+        """
+        初始化LLM引擎和工具执行器
+
+        Args:
+            warmup: 是否预热，不指定时按 MODEL_CONFIG["warmup"]（默认关闭）
+        """
+        from core.llm_engine import LLMFactory
+        from core.tool_executor import ToolExecutor
+
+        if self.llm_factory is None:
+            self.llm_factory = LLMFactory()
         self.llm_engine = self.llm_factory.create_engine(
             producer=MODEL_CONFIG.get("producer", ""),
             model=MODEL_CONFIG.get("model", ""),
@@ -41,36 +161,38 @@ class SessionAwareCodeAssistant:
             session_manager=self.session_manager
         )
 
-    def _convert_agent_steps_to_session_steps(self, agent_steps: list) -> list:
-        """将Agent步骤转换为会话步骤"""
-        session_steps = []
-        for step in agent_steps:
-            tool_results = []
-            for result in step.tool_results:
-                tool_results.append({
-                    "tool_name": getattr(result, 'tool_name', 'unknown'),
-                    "success": getattr(result, 'success', False),
-                    "content": getattr(result, 'content', ''),
-                    "error": getattr(result, 'error', '')
-                })
-
-            session_step = SessionStep(
-                step_number=step.step_number,
-                timestamp=step.timestamp,
-                user_input=step.user_input,
-                llm_response=step.llm_response,
-                tool_calls=step.tool_calls,
-                tool_results=tool_results,
-                is_completed=step.is_completed,
-                final_message=step.final_message,
-                thinking=getattr(step, 'thinking', None)
-            )
-            session_steps.append(session_step)
-
-        return session_steps
+        if warmup is None:
+            warmup = MODEL_CONFIG.get("warmup", False)
+        if warmup:
+            self.warmup()
+
+    def warmup(self):
+        """预热LLM引擎和工具执行器，单独打印耗时以便与之后每次请求的延迟区分"""
+        self.tool_executor.warmup()
+        try:
+            elapsed = self.llm_engine.warmup()
+        except Exception as e:
+            print(f"引擎预热失败（不影响使用）: {e}")
+            return
+        print(f"引擎预热完成，耗时 {elapsed:.2f}s")
 
     def _get_session_context_for_prompt(self) -> str:
-        """获取会话摘要用于提示词"""
+        """获取会话摘要用于提示词（按会话ID、问题数和更新时间缓存）"""
+        session = self.session_manager.get_session(self.session_manager._current_session_id)
+        key = (session.session_id, len(session.questions), session.updated_at) if session else None
+        cached = self._ctx_cache.get(key)
+        if cached is not None:
+            self._ctx_cache.move_to_end(key)
+            return cached
+
+        context = self._build_session_context()
+        self._ctx_cache[key] = context
+        while len(self._ctx_cache) > self.CONTEXT_CACHE_SIZE:
+            self._ctx_cache.popitem(last=False)
+        return context
+
+    def _build_session_context(self) -> str:
+        """根据会话摘要生成提示词中的会话上下文"""
         summary = self.session_manager.get_session_summary()
 
         if summary.get("session_id") is None:
@@ -79,18 +201,68 @@ class SessionAwareCodeAssistant:
         if summary["questions_count"] == 0:
             return "当前会话暂无历史记录。"
 
-        lines = ["已完成的问题和结果:", ""]
+        parts = []
+        if summary["rolling_summary"]:
+            parts += ["更早的问题概要:", summary["rolling_summary"], "", "最近的问题和结果:", ""]
+        else:
+            parts += ["已完成的问题和结果:", ""]
+        parts.extend(
+            line
+            for qs in summary["recent"]
+            for line in (
+                (f"[{qs['index']}] 问题: {qs['question']}",)
+                + ((f"    结果: {qs['summary']}",) if qs['summary'] else ())
+                + ("",)
+            )
+        )
+        return "\n".join(parts)
+
+    def _invalidate_response_cache(self):
+        """工作区可能已被修改：推进工作区版本并丢弃所有缓存结果"""
+        self._workspace_generation += 1
+        self._response_cache.clear()
+
+    def _record_question(self, session_id: str, question: str, steps: List[Future], summary: str):
+        """
+        提交问题记录到后台线程，写入会话后立即刷新日志
+
+        Args:
+            steps: 各步骤 to_dict 的Future，与记录任务提交到同一个单线程执行器，记录时都已完成
+        """
+        def persist():
+            self.session_manager.add_question(
+                session_id=session_id,
+                question=question,
+                steps=[step.result() for step in steps],
+                summary=summary
+            )
+            self.session_manager.flush()
 
-        for qs in summary["question_summaries"]:
-            lines.append(f"[{qs['index']}] 问题: {qs['question']}")
-            if qs['summary']:
-                lines.append(f"    结果: {qs['summary']}")
-            lines.append("")
+        self._pending_persist = self._persist_executor.submit(persist)
 
-        return "\n".join(lines)
+    def _wait_persisted(self):
+        """等待尚未完成的问题记录，之后读取会话状态时能看到它"""
+        future, self._pending_persist = self._pending_persist, None
+        if future is not None:
+            future.result()
 
     def interactive(self, max_iterations: int = 200, verbose: bool = True):
         """交互模式"""
+        import asyncio
+        try:
+            asyncio.run(self._interactive_async(max_iterations, verbose))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.agent:
+                self.agent.close()
+            self._wait_persisted()
+
+    async def _interactive_async(self, max_iterations: int = 200, verbose: bool = True):
+        """交互模式主循环：等待输入和执行任务时事件循环可以并发处理会话写入等后台任务"""
+        import asyncio
+        from core.agent_engine import AgentEngine, AgentConfig, PARALLEL_SAFE_TOOLS, write_console
+
         if not self.llm_engine:
             self.setup_engine()
 
@@ -101,7 +273,8 @@ class SessionAwareCodeAssistant:
 
         config = AgentConfig(
             max_iterations=max_iterations,
-            verbose_output=verbose
+            verbose_output=verbose,
+            response_cache_dir=LLM_CACHE_DIR if self.response_cache_enabled else None
         )
         self.agent = AgentEngine(
             self.llm_engine,
@@ -110,11 +283,7 @@ class SessionAwareCodeAssistant:
             session_summary=session_context
         )
 
-        print("=" * 60)
-        print("  AI Agent - 智能编程助手 (会话模式)")
-        print("=" * 60)
-        print(f"工作目录: {self.workdir}")
-        print(f"最大迭代次数: {max_iterations}")
+        sys.stdout.write(self._BANNER_TEMPLATE.format(workdir=self.workdir, max_iterations=max_iterations))
 
         session_id = self.session_manager.get_or_restore_session()
         current_session = self.session_manager.get_session(session_id)
@@ -124,46 +293,33 @@ class SessionAwareCodeAssistant:
                 print(f"已有问题数: {len(current_session.questions)}")
             else:
                 print(f"新建会话: {session_id}")
-        print("-" * 60)
-        print("输入您的任务描述，或输入 'quit'/'exit' 退出")
-        print("示例: 创建一个HTTP服务器")
-        print("会话管理命令:")
-        print("  /new           - 创建新会话")
-        print("  /show          - 列出所有会话")
-        print("  /switch <id>   - 切换到指定会话")
-        print("  /delete <id>   - 删除会话")
-        print("=" * 60)
+        sys.stdout.write(self._HELP_TEXT)
 
         while True:
             try:
                 print()
-                user_input = input("> ").strip()
+                user_input = (await _ainput("> ")).strip()
+
+                # 上一个问题通常已在输入期间写完；处理命令或任务前确保会话状态已包含它
+                if self._pending_persist is not None:
+                    await asyncio.wrap_future(self._pending_persist)
+                    self._pending_persist = None
+                    # 会话上下文只在末尾追加了刚完成的问题，之前的部分不变
+                    self.agent._session_summary = self._get_session_context_for_prompt()
 
                 if not user_input:
                     continue
 
-                if user_input.lower() in ['quit', 'exit', 'q', '退出']:
+                if len(user_input) <= _QUIT_MAX_LEN and user_input.lower() in _QUIT_COMMANDS:
                     print("再见！")
                     break
 
-                if user_input.startswith('/new'):
-                    self._handle_new_command(user_input)
-                    continue
-
-                if user_input.startswith('/show'):
-                    self._print_session_list()
-                    continue
-
-                if user_input.startswith('/switch'):
-                    self._handle_switch_command(user_input)
-                    continue
-
-                if user_input.startswith('/delete'):
-                    self._handle_delete_command(user_input)
-                    continue
-
                 if user_input.startswith('/'):
-                    print(f"未知命令: {user_input}")
+                    handler = self._COMMANDS.get(user_input.partition(' ')[0])
+                    if handler is None:
+                        print(f"未知命令: {user_input}")
+                    else:
+                        getattr(self, handler)(user_input)
                     continue
 
                 print("\n" + "-" * 60)
@@ -175,18 +331,57 @@ class SessionAwareCodeAssistant:
                 if current_session:
                     print(f"当前会话: {session_id}")
 
-                execution_steps = []
+                cache_key = None
+                if self.response_cache_enabled:
+                    cache_key = (session_id, self._workspace_generation, user_input)
+                    cached = self._response_cache.get(cache_key)
+                    if cached is not None:
+                        self._response_cache.move_to_end(cache_key)
+                        session_steps, final_summary = cached
+                        print("\n(命中响应缓存，复用本会话中相同任务的结果)")
+                        print("\n任务完成! 最终回答:")
+                        print("-" * 60)
+                        print(final_summary)
+                        print("-" * 60)
+                        self._record_question(session_id, user_input, session_steps, final_summary)
+                        continue
+
+                # 每个步骤产生后立即在后台线程渲染为存储用的字典，与等待LLM的时间重叠
+                session_steps: List[Future] = []
                 final_summary = None
-
-                for step in self.agent.start(user_input):
-                    execution_steps.append(step)
+                streamed = False
+                read_only = True
+
+                def write_token(text: str):
+                    # 在执行步骤的线程中调用：LLM回复边生成边输出，与思考过程、日志走同一个输出队列
+                    nonlocal streamed
+                    if not streamed:
+                        streamed = True
+                        text = "\n" + text
+                    write_console(text)
+
+                async for step in self.agent.astart(user_input, on_token=write_token):
+                    session_steps.append(self._persist_executor.submit(step.to_dict))
+                    if step.tool_results and not all(
+                        result.tool_name in PARALLEL_SAFE_TOOLS for result in step.tool_results
+                    ):
+                        read_only = False
+                        self._invalidate_response_cache()
+                    step_streamed, streamed = streamed, False
+                    if step_streamed:
+                        sys.stdout.write("\n")
 
                     if step.is_completed:
                         if step.final_message:
-                            print("\n任务完成! 最终回答:")
-                            print("-" * 60)
-                            print(step.final_message)
-                            print("-" * 60)
+                            if step_streamed and step.final_message == step.llm_response:
+                                # 最终回答已在上方流式输出，不再重复打印
+                                print("-" * 60)
+                                print("任务完成!")
+                            else:
+                                print("\n任务完成! 最终回答:")
+                                print("-" * 60)
+                                print(step.final_message)
+                                print("-" * 60)
                             final_summary = step.final_message
                         break
 
@@ -196,21 +391,23 @@ class SessionAwareCodeAssistant:
                 summary = self.agent.get_execution_summary()
                 print(f"\n执行统计: {summary['total_steps']} 步, {summary['successful_tool_calls']}/{summary['total_tool_calls']} 工具成功")
 
-                session_steps = self._convert_agent_steps_to_session_steps(execution_steps)
-
+                # 只缓存正常完成且没有写文件、执行命令的任务，其余结果不复用
+                if final_summary is None or not read_only:
+                    cache_key = None
                 if final_summary is None:
                     final_summary = summary.get('final_message', f"执行完成: {summary['total_steps']}步, {summary['successful_tool_calls']}个工具调用成功")
 
-                self.session_manager.add_question(
-                    session_id=session_id,
-                    question=user_input,
-                    steps=session_steps,
-                    summary=final_summary
-                )
+                self._record_question(session_id, user_input, session_steps, final_summary)
+                if cache_key is not None:
+                    self._response_cache[cache_key] = (session_steps, final_summary)
+                    while len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+                        self._response_cache.popitem(last=False)
 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError, asyncio.CancelledError) as e:
                 print("\n\n检测到中断信号，正在停止...")
                 self.agent.stop()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
                 break
             except Exception as e:
                 print(f"\n错误: {e}")
@@ -225,6 +422,10 @@ class SessionAwareCodeAssistant:
         if self.agent:
             self.agent._session_summary = self._get_session_context_for_prompt()
 
+    def _handle_show_command(self, command: str):
+        """处理列出会话命令"""
+        self._print_session_list()
+
     def _handle_switch_command(self, command: str):
         """处理切换会话命令"""
         parts = command.split()
@@ -293,7 +494,10 @@ class SessionAwareCodeAssistant:
         print()
 
 
-def main():
+def _build_parser():
+    """构建完整的命令行解析器（仅在需要帮助信息或参数无法快速解析时使用）"""
+    import argparse
+
     parser = argparse.ArgumentParser(
         description="AI Agent - 智能编程助手 (会话模式)",
         formatter_class=argparse.RawDescriptionHelpFormatter
@@ -307,9 +511,61 @@ def main():
         help='工作目录路径（默认: 当前目录）'
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--response-cache',
+        action='store_true',
+        help='启用会话内相同任务的响应缓存（只复用没有写文件、执行命令的任务结果）'
+    )
 
-    assistant = SessionAwareCodeAssistant(workdir=args.workdir)
+    parser.add_argument(
+        '--warmup-only',
+        action='store_true',
+        help='只初始化并预热引擎后退出（用于检查配置和连通性）'
+    )
+
+    return parser
+
+
+def _parse_args(argv: List[str]) -> SimpleNamespace:
+    """
+    解析命令行参数
+
+    常见的参数组合直接手工解析，不必导入argparse；
+    遇到帮助、缩写或无法识别的参数时交给argparse，由它输出帮助或错误信息。
+    """
+    args = SimpleNamespace(workdir='.', response_cache=False, warmup_only=False)
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--workdir':
+            # 与 nargs='?' 一致：不带值时为None（使用当前目录）
+            if i + 1 < len(argv) and not argv[i + 1].startswith('-'):
+                args.workdir = argv[i + 1]
+                i += 1
+            else:
+                args.workdir = None
+        elif arg.startswith('--workdir='):
+            args.workdir = arg.partition('=')[2]
+        elif arg == '--response-cache':
+            args.response_cache = True
+        elif arg == '--warmup-only':
+            args.warmup_only = True
+        else:
+            return SimpleNamespace(**vars(_build_parser().parse_args(argv)))
+        i += 1
+    return args
+
+
+def main():
+    args = _parse_args(sys.argv[1:])
+
+    assistant = SessionAwareCodeAssistant(
+        workdir=args.workdir,
+        response_cache=args.response_cache
+    )
+    if args.warmup_only:
+        assistant.setup_engine(warmup=True)
+        return
     assistant.setup_engine()
     assistant.interactive()
 